@@ -0,0 +1,331 @@
+"""
+End-to-end load test: throughput and latency per endpoint.
+
+Boots main.app in-process over httpx's ASGI transport, against the
+in-memory Mongo stand-in, so no server or database is needed. The app
+seeds a user, posts, comments and the search index. Then --concurrency
+virtual users run weighted scenarios for --seconds, each starting the
+next scenario as soon as the last one finishes:
+
+    feed     GET /api/posts/ (first page, a post_type tab, or page 2)
+    search   GET /api/posts/?search=...
+    post     GET /api/posts/{post_id} followed by GET /api/comments/{post_id}
+    comment  POST /api/comments/
+    login    POST /api/auth/login (one bcrypt verify)
+
+The report gives requests/sec and p50/p95/p99 per endpoint. --output saves
+it as JSON with the git commit, so two runs can be compared. The stand-in
+is much faster than a real server round trip, so the numbers show the
+app's own CPU cost: routing, validation, serialization and hashing.
+
+Usage (from the backend directory, after pip install -r benchmarks/requirements.txt):
+    python -m benchmarks.load_test run --seconds 20 --concurrency 16 --output before.json
+    python -m benchmarks.load_test run --mix feed=60,post=30,comment=10 --output after.json
+    python -m benchmarks.load_test compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ["MONGODB_URL"] = "mongomock://"
+os.environ["ENVIRONMENT"] = "benchmark"
+# Every virtual user logs in from the same address
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+DEFAULT_MIX = "feed=45,search=15,post=25,comment=10,login=5"
+POST_TYPES = ["notes", "jobs", "threads"]
+WORDS = (
+    "algorithms calculus physics chemistry notes exam midterm lecture internship "
+    "referral backend frontend python java react machine learning data systems "
+    "networks security databases compilers statistics economics finance startup"
+).split()
+QUERIES = ["python", "machine learning", "calc", "internship", "datab", "exam notes"]
+USER = {"email": "load@example.com", "username": "load", "name": "Load Test", "password": "loadtestpassword"}
+
+
+def percentile(timings: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not timings:
+        return 0.0
+    return timings[min(max(int(round(p / 100 * len(timings))) - 1, 0), len(timings) - 1)]
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name.strip()!r}; choose from {', '.join(SCENARIOS)}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.recording = False
+
+    async def request(self, client, endpoint: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        if self.recording:
+            self.timings[endpoint].append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                self.errors[endpoint] += 1
+        return response
+
+
+class LoadTest:
+    def __init__(self, client, recorder: Recorder, posts: int, comments_per_post: int):
+        self.client = client
+        self.recorder = recorder
+        self.posts = posts
+        self.comments_per_post = comments_per_post
+        self.post_ids = []
+        self.auth_headers = {}
+
+    async def seed(self):
+        from models.database import comments_collection, posts_collection
+        from models.search import rebuild_search_index
+
+        signup = await self.client.post("/api/auth/signup", json=USER)
+        signup.raise_for_status()
+        login = await self.client.post("/api/auth/login", json={"email": USER["email"], "password": USER["password"]})
+        self.auth_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        me = (await self.client.get("/api/auth/me", headers=self.auth_headers)).json()
+
+        now = datetime.utcnow()
+        posts = [
+            {
+                "title": " ".join(random.choices(WORDS, k=random.randint(3, 8))).title(),
+                "content": " ".join(random.choices(WORDS, k=60)),
+                "post_type": random.choice(POST_TYPES),
+                "tags": random.sample(WORDS, k=3),
+                "author_id": me["id"],
+                "author_name": me["name"],
+                "author_username": me["username"],
+                "author_profile_picture": "",
+                "comments_count": self.comments_per_post,
+                "created_at": now - timedelta(seconds=i),
+                "updated_at": now - timedelta(seconds=i),
+            }
+            for i in range(self.posts)
+        ]
+        result = await posts_collection.insert_many(posts)
+        self.post_ids = [str(post_id) for post_id in result.inserted_ids]
+        comments = [
+            {
+                "content": f"Comment {j}", "post_id": post_id, "parent_comment_id": None, "ancestors": [], "depth": 0,
+                "author_id": me["id"], "author_name": me["name"], "author_username": me["username"],
+                "author_profile_picture": "",
+                "created_at": now + timedelta(milliseconds=j), "updated_at": now + timedelta(milliseconds=j),
+            }
+            for post_id in self.post_ids
+            for j in range(self.comments_per_post)
+        ]
+        if comments:
+            await comments_collection.insert_many(comments)
+        await rebuild_search_index()
+
+    # --- scenarios ---
+
+    async def feed(self):
+        roll = random.random()
+        if roll < 0.6:
+            await self.recorder.request(self.client, "GET /api/posts/", "GET", "/api/posts/")
+        elif roll < 0.85:
+            await self.recorder.request(self.client, "GET /api/posts/?post_type", "GET", "/api/posts/",
+                                        params={"post_type": random.choice(POST_TYPES)})
+        else:
+            first = await self.recorder.request(self.client, "GET /api/posts/", "GET", "/api/posts/")
+            cursor = first.headers.get("x-next-cursor")
+            if cursor:
+                await self.recorder.request(self.client, "GET /api/posts/?cursor", "GET", "/api/posts/",
+                                            params={"cursor": cursor})
+
+    async def search(self):
+        await self.recorder.request(self.client, "GET /api/posts/?search", "GET", "/api/posts/",
+                                    params={"search": random.choice(QUERIES)})
+
+    async def post(self):
+        post_id = random.choice(self.post_ids)
+        await self.recorder.request(self.client, "GET /api/posts/{post_id}", "GET", f"/api/posts/{post_id}")
+        await self.recorder.request(self.client, "GET /api/comments/{post_id}", "GET", f"/api/comments/{post_id}")
+
+    async def comment(self):
+        await self.recorder.request(self.client, "POST /api/comments/", "POST", "/api/comments/",
+                                    json={"content": "Load test comment", "post_id": random.choice(self.post_ids)},
+                                    headers=self.auth_headers)
+
+    async def login(self):
+        await self.recorder.request(self.client, "POST /api/auth/login", "POST", "/api/auth/login",
+                                    json={"email": USER["email"], "password": USER["password"]})
+
+
+SCENARIOS = {
+    "feed": LoadTest.feed,
+    "search": LoadTest.search,
+    "post": LoadTest.post,
+    "comment": LoadTest.comment,
+    "login": LoadTest.login,
+}
+
+
+async def virtual_user(test: LoadTest, names: list, weights: list, deadline: float, counts: dict):
+    while time.perf_counter() < deadline:
+        name = random.choices(names, weights)[0]
+        await SCENARIOS[name](test)
+        if test.recorder.recording:
+            counts[name] += 1
+
+
+async def run(args) -> dict:
+    import httpx
+    from main import app
+
+    random.seed(args.seed)
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+    recorder = Recorder()
+    counts = defaultdict(int)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+        test = LoadTest(client, recorder, args.posts, args.comments)
+        await test.seed()
+
+        if args.warmup > 0:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(virtual_user(test, names, weights, deadline, counts) for _ in range(args.concurrency)))
+
+        recorder.recording = True
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(*(virtual_user(test, names, weights, deadline, counts) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for endpoint, timings in sorted(recorder.timings.items()):
+        timings.sort()
+        endpoints[endpoint] = {
+            "requests": len(timings),
+            "errors": recorder.errors[endpoint],
+            "rps": round(len(timings) / elapsed, 1),
+            "mean_ms": round(sum(timings) / len(timings), 2),
+            "p50_ms": round(percentile(timings, 50), 2),
+            "p95_ms": round(percentile(timings, 95), 2),
+            "p99_ms": round(percentile(timings, 99), 2),
+        }
+    total = sum(endpoint["requests"] for endpoint in endpoints.values())
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "seconds": args.seconds, "warmup": args.warmup, "concurrency": args.concurrency,
+            "mix": mix, "posts": args.posts, "comments": args.comments, "seed": args.seed,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "total_requests": total,
+        "total_rps": round(total / elapsed, 1),
+        "scenarios": dict(counts),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(result: dict):
+    print(f"\n{result['total_requests']} requests in {result['elapsed_seconds']}s = {result['total_rps']} req/s "
+          f"(commit {result['commit']}, concurrency {result['config']['concurrency']})")
+    print(f"{'endpoint':<32} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for endpoint, stats in result["endpoints"].items():
+        print(f"{endpoint:<32} {stats['requests']:>8} {stats['errors']:>6} {stats['rps']:>8} "
+              f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> int:
+    """Print per-endpoint changes; returns the number of regressions past threshold %"""
+    print(f"baseline {baseline['commit']} ({baseline['created_at']}) -> current {current['commit']} ({current['created_at']})")
+    if baseline["config"] != current["config"]:
+        print("⚠️ The runs used different settings; the comparison may not be meaningful")
+    print(f"{'endpoint':<32} {'req/s':>16} {'p50 ms':>18} {'p99 ms':>18}")
+
+    def change(before, after) -> str:
+        if not before:
+            return "     n/a"
+        return f"{(after - before) / before * 100:+7.1f}%"
+
+    regressions = 0
+    for endpoint in sorted(set(baseline["endpoints"]) | set(current["endpoints"])):
+        before = baseline["endpoints"].get(endpoint)
+        after = current["endpoints"].get(endpoint)
+        if before is None or after is None:
+            print(f"{endpoint:<32} only in {'current' if before is None else 'baseline'}")
+            continue
+        p99_change = (after["p99_ms"] - before["p99_ms"]) / before["p99_ms"] * 100 if before["p99_ms"] else 0.0
+        rps_change = (before["rps"] - after["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        regressed = p99_change > threshold or rps_change > threshold
+        regressions += regressed
+        print(f"{'❌' if regressed else '  '}{endpoint:<30} "
+              f"{after['rps']:>8} {change(before['rps'], after['rps'])} "
+              f"{after['p50_ms']:>9} {change(before['p50_ms'], after['p50_ms'])} "
+              f"{after['p99_ms']:>9} {change(before['p99_ms'], after['p99_ms'])}")
+    print(f"\ntotal req/s {baseline['total_rps']} -> {current['total_rps']} {change(baseline['total_rps'], current['total_rps'])}")
+    return regressions
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the load test")
+    run_parser.add_argument("--seconds", type=float, default=20)
+    run_parser.add_argument("--warmup", type=float, default=3, help="seconds of unrecorded load first")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    run_parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario weights, e.g. feed=60,post=40")
+    run_parser.add_argument("--posts", type=int, default=500)
+    run_parser.add_argument("--comments", type=int, default=10, help="comments seeded per post")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--output", help="save the results as JSON")
+
+    compare_parser = commands.add_parser("compare", help="compare two saved results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=10.0,
+                                help="flag endpoints whose p99 rises or req/s falls by more than this %%")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        baseline = json.loads(Path(args.baseline).read_text())
+        current = json.loads(Path(args.current).read_text())
+        return 1 if compare(baseline, current, args.threshold) else 0
+
+    result = asyncio.run(run(args))
+    print_report(result)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2) + "\n")
+        print(f"\n✅ Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
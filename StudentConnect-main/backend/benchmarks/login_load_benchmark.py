@@ -0,0 +1,97 @@
+"""
+Feed latency while logins hammer bcrypt, with hashing inline vs on the pool.
+
+Runs main.app in-process against the in-memory Mongo stand-in, keeps
+--logins concurrent login loops busy and measures GET /api/posts/ latency
+from a separate reader. The "inline" run reproduces the old behaviour of
+hashing on the event loop; "pool" uses the bounded password executor.
+
+Usage (from the backend directory, after pip install -r benchmarks/requirements.txt):
+    python -m benchmarks.login_load_benchmark --logins 8 --seconds 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from datetime import datetime
+
+os.environ["MONGODB_URL"] = "mongomock://"
+os.environ["ENVIRONMENT"] = "benchmark"
+# The benchmark deliberately hammers login from one address
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from models.database import posts_collection  # noqa: E402
+import utils.auth as auth  # noqa: E402
+
+USER = {"email": "bench@example.com", "username": "bench", "name": "Bench", "password": "benchpassword"}
+
+
+async def seed(client: httpx.AsyncClient):
+    await client.post("/api/auth/signup", json=USER)
+    now = datetime.utcnow()
+    await posts_collection.insert_many([
+        {
+            "title": f"Post {i}", "content": "Lorem ipsum " * 20, "post_type": "threads",
+            "tags": ["bench"], "author_id": "bench", "author_name": "Bench",
+            "author_username": "bench", "author_profile_picture": "",
+            "comments_count": 0, "created_at": now, "updated_at": now,
+        }
+        for i in range(50)
+    ])
+
+
+async def login_loop(client: httpx.AsyncClient, deadline: float):
+    credentials = {"email": USER["email"], "password": USER["password"]}
+    while time.perf_counter() < deadline:
+        await client.post("/api/auth/login", json=credentials)
+
+
+async def feed_loop(client: httpx.AsyncClient, deadline: float, interval: float = 0.02) -> list:
+    """Issue feed reads on a fixed schedule; latency counts from the scheduled
+    send time, so time spent waiting for a blocked event loop is included"""
+    timings = []
+    scheduled = time.perf_counter()
+    while scheduled < deadline:
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+        await client.get("/api/posts/")
+        timings.append((time.perf_counter() - scheduled) * 1000)
+        scheduled += interval
+    return timings
+
+
+async def run(mode: str, logins: int, seconds: float) -> dict:
+    auth.PASSWORD_HASH_WORKERS = 0 if mode == "inline" else max(auth.PASSWORD_HASH_WORKERS, 1)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + seconds
+        results = await asyncio.gather(
+            feed_loop(client, deadline),
+            *(login_loop(client, deadline) for _ in range(logins))
+        )
+    timings = sorted(results[0])
+    return {
+        "requests": len(timings),
+        "p50_ms": statistics.median(timings),
+        "p99_ms": timings[max(int(len(timings) * 0.99) - 1, 0)],
+    }
+
+
+async def main(args):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await seed(client)
+
+    print(f"GET /api/posts/ latency with {args.logins} concurrent login loops, bcrypt cost {auth.BCRYPT_ROUNDS}")
+    for mode in ("inline", "pool"):
+        result = await run(mode, args.logins, args.seconds)
+        print(f"{mode:>7}: {result['requests']} feed requests  p50 {result['p50_ms']:.1f} ms  p99 {result['p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,268 @@
+"""
+Micro-benchmarks for the CPU-bound hot paths, with a regression check.
+
+Each benchmark times one pure function on synthetic data sized like
+production. No database or server is needed.
+
+    comment_tree_10k       build_comment_tree() over a 10k-comment thread (GET /api/comments/{post_id})
+    post_page_wire_100     post_to_wire (one validation pass) + ORJSONResponse for a 100-post feed page
+    post_page_model_100    PostResponse construction for the same page (the pre-serializer path)
+    jwt_encode             create_access_token()
+    jwt_decode             jwt.decode() as done by verify_token()
+    parse_tags             parse_tags() on a create_new_post tags field
+    bcrypt_verify          password_context().verify() at the configured BCRYPT_ROUNDS
+
+Every benchmark runs the way timeit does. It first picks a loop count that
+takes at least 0.2s, then repeats that --repeats times (15 by default).
+Comparisons use the median repeat.
+
+--check exits non-zero when a benchmark regressed against a reference:
+its median is more than the threshold slower (--threshold, or the
+benchmark's entry in THRESHOLDS for the noisier ones), and even its
+fastest repeat is slower than the reference median. The second condition
+keeps a single noisy run from failing the check.
+
+The reference is one of:
+- --against REF: the same benchmarks run on a git ref (checked out into a
+  temporary worktree) right before this run, on the same machine. Use this
+  in CI, e.g. --check --against origin/main.
+- micro_baseline.json: stored timings. They only compare on the machine
+  that recorded them, so refresh them with --save-baseline when you change
+  machines, and in any change that deliberately makes a path slower.
+
+Usage (from the backend directory):
+    python -m benchmarks.micro_benchmarks
+    python -m benchmarks.micro_benchmarks --only comment_tree --check --against main
+    python -m benchmarks.micro_benchmarks --save-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from bson import ObjectId
+from jose import jwt
+
+BASELINE_PATH = Path(__file__).parent / "micro_baseline.json"
+DEFAULT_THRESHOLD = 25.0
+# Benchmarks that vary more from run to run than DEFAULT_THRESHOLD allows:
+# the comment tree allocates heavily (garbage collection pauses) and
+# parse_tags is sub-microsecond
+THRESHOLDS = {
+    "comment_tree_10k": 40.0,
+    "parse_tags": 40.0,
+}
+REPEATS = 15
+
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    """Register a setup function that builds fixtures and returns the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def synthetic_thread(count: int, roots: int) -> list:
+    """`count` comments in creation order; after the first `roots`, each
+    replies to a random earlier comment"""
+    now = datetime.utcnow()
+    comments = []
+    for i in range(count):
+        parent = random.choice(comments) if i >= roots else None
+        comments.append({
+            "_id": ObjectId(),
+            "content": "Thanks, this helped with the midterm " * random.randint(1, 4),
+            "post_id": "652f1c0e8a1b2c3d4e5f6a7b",
+            "parent_comment_id": str(parent["_id"]) if parent else None,
+            "author_id": str(ObjectId()),
+            "author_name": "Priya Raman",
+            "author_username": "priya",
+            "author_profile_picture": "https://res.cloudinary.com/demo/image/upload/profile.jpg",
+            "created_at": now + timedelta(seconds=i),
+            "updated_at": now + timedelta(seconds=i),
+        })
+    return comments
+
+
+@benchmark("comment_tree_10k")
+def comment_tree():
+    from routes.comments import build_comment_tree
+    comments = synthetic_thread(10_000, roots=1_000)
+    return lambda: build_comment_tree(comments)
+
+
+@benchmark("post_page_wire_100")
+def post_page_wire():
+    from fastapi.responses import ORJSONResponse
+    from models.serializers import post_to_wire
+    from benchmarks.serialization_benchmark import synthetic_post
+    now = datetime.utcnow()
+    posts = [synthetic_post(i, now) for i in range(100)]
+    return lambda: ORJSONResponse([post_to_wire(post) for post in posts]).body
+
+
+@benchmark("post_page_model_100")
+def post_page_model():
+    from models.schemas import PostResponse
+    from models.serializers import post_to_wire
+    from benchmarks.serialization_benchmark import synthetic_post
+    now = datetime.utcnow()
+    wire = [post_to_wire(synthetic_post(i, now)) for i in range(100)]
+    return lambda: [PostResponse(**post) for post in wire]
+
+
+@benchmark("jwt_encode")
+def jwt_encode():
+    from utils.auth import create_access_token
+    return lambda: create_access_token({"sub": "priya@example.com"}, timedelta(minutes=30))
+
+
+@benchmark("jwt_decode")
+def jwt_decode():
+    from utils.auth import ALGORITHM, SECRET_KEY, create_access_token
+    token = create_access_token({"sub": "priya@example.com"}, timedelta(minutes=30))
+    return lambda: jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+@benchmark("parse_tags")
+def parse_tags():
+    from routes.posts import parse_tags
+    tags = "python, backend , internship,remote, react, machine learning"
+    return lambda: parse_tags(tags)
+
+
+@benchmark("bcrypt_verify")
+def bcrypt_verify():
+    from utils.auth import password_context
+    context = password_context()
+    hashed = context.hash("correct horse battery staple")
+    return lambda: context.verify("correct horse battery staple", hashed)
+
+
+def measure(func, repeats: int = REPEATS) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    rounds = [total / number for total in timer.repeat(repeat=repeats, number=number)]
+    rounds.sort()
+    return {
+        "min_us": round(rounds[0] * 1e6, 3),
+        "median_us": round(rounds[len(rounds) // 2] * 1e6, 3),
+        "loops": number,
+    }
+
+
+def run_benchmarks(only: str = None, repeats: int = REPEATS) -> dict:
+    random.seed(1)
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if only and only not in name:
+            continue
+        try:
+            results[name] = measure(setup(), repeats)
+        except Exception as e:
+            # e.g. a git ref from before the function existed
+            print(f"⚠️ {name} skipped: {e!r}", file=sys.stderr)
+    return results
+
+
+def measure_ref(ref: str, only: str, repeats: int) -> dict:
+    """Run these benchmarks against the code at a git ref, in a temporary worktree"""
+    backend = Path(__file__).resolve().parent.parent
+    root = Path(subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=backend,
+                               capture_output=True, text=True, check=True).stdout.strip())
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / "ref"
+        subprocess.run(["git", "worktree", "add", "--detach", "--quiet", str(worktree), ref], cwd=root, check=True)
+        try:
+            ref_backend = worktree / backend.relative_to(root)
+            output = Path(tmp) / "results.json"
+            command = [sys.executable, str(Path(__file__).resolve()), "--output", str(output), "--repeats", str(repeats)]
+            if only:
+                command += ["--only", only]
+            # This script, importing the app modules from the ref's checkout
+            env = {**os.environ, "PYTHONPATH": str(ref_backend)}
+            subprocess.run(command, cwd=ref_backend, env=env, check=True, stdout=subprocess.DEVNULL)
+            return json.loads(output.read_text())
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=root, check=False)
+
+
+def compare(name: str, result: dict, reference: dict, threshold: float):
+    """Percent change of the median, and whether it counts as a regression"""
+    change = (result["median_us"] - reference["median_us"]) / reference["median_us"] * 100
+    regressed = change > THRESHOLDS.get(name, threshold) and result["min_us"] > reference["median_us"]
+    return change, regressed
+
+
+def format_time(microseconds: float) -> str:
+    if microseconds >= 1000:
+        return f"{microseconds / 1000:.2f} ms"
+    return f"{microseconds:.2f} us"
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="run only benchmarks whose name contains this")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="timed repeats per benchmark")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--against", metavar="REF", help="compare with this git ref, measured now, instead of the baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="write these timings as the new baseline")
+    parser.add_argument("--output", type=Path, help="write these timings as JSON to this file")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any benchmark regressed past its threshold")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of the median in percent (THRESHOLDS overrides it per benchmark)")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        args.output.write_text(json.dumps(run_benchmarks(args.only, args.repeats)))
+        return 0
+
+    if args.against:
+        print(f"⏳ Measuring {args.against}")
+        reference_results = measure_ref(args.against, args.only, args.repeats)
+        reference_label = args.against
+    else:
+        reference_results = json.loads(args.baseline.read_text())["results"] if args.baseline.exists() else {}
+        reference_label = "baseline"
+
+    print("⏳ Measuring the working tree")
+    results = run_benchmarks(args.only, args.repeats)
+    regressions = []
+    print(f"{'benchmark':<22} {'min':>12} {'median':>12} {reference_label[:12]:>12} {'change':>9}")
+    for name, result in results.items():
+        line = f"{name:<22} {format_time(result['min_us']):>12} {format_time(result['median_us']):>12}"
+        reference = reference_results.get(name)
+        if reference:
+            change, regressed = compare(name, result, reference, args.threshold)
+            if regressed:
+                regressions.append(name)
+            line += f" {format_time(reference['median_us']):>12} {change:+8.1f}%{' ❌' if regressed else ''}"
+        print(line)
+
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text())["results"] if args.baseline.exists() else {}
+        args.baseline.write_text(json.dumps({
+            "machine": f"{platform.machine()} {platform.processor() or platform.system()}",
+            "python": platform.python_version(),
+            "updated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "results": {**baseline, **results},
+        }, indent=2) + "\n")
+        print(f"✅ Baseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"❌ Slower than {reference_label}: {', '.join(regressions)}")
+        return 1 if args.check else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
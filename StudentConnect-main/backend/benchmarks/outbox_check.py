@@ -0,0 +1,136 @@
+"""
+Check the email outbox against a local SMTP server.
+
+Starts an aiosmtpd server on a free local port, points the outbox at it and
+drives OutboxSender.process_once() directly against the in-memory MongoDB:
+
+- a batch is delivered over one reused SMTP connection
+- a temporary SMTP failure is retried with backoff and then delivered
+- a message that keeps failing is given up after OUTBOX_MAX_ATTEMPTS
+- sent and failed messages lose their body (the reset link) and get an
+  expires_at for the TTL index
+
+Usage (from the backend directory, after pip install -r benchmarks/requirements.txt):
+    python -m benchmarks.outbox_check
+"""
+import asyncio
+import os
+import socket
+import sys
+from datetime import datetime
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# Must be set before utils.settings is imported
+SMTP_PORT = free_port()
+os.environ.update({
+    "MONGODB_URL": "mongomock://",
+    "DATABASE_NAME": "studentconnect_outbox_check",
+    "ENVIRONMENT": "benchmark",
+    "SMTP_HOST": "127.0.0.1",
+    "SMTP_PORT": str(SMTP_PORT),
+    "SMTP_STARTTLS": "false",
+    "SMTP_USER": "",
+    "SMTP_PASSWORD": "",
+})
+
+from aiosmtpd.controller import Controller  # noqa: E402
+import utils.outbox as outbox  # noqa: E402
+
+SENDER = "outbox-check@example.com"
+
+
+class RecordingHandler:
+    """Accepts mail, counting connections; fails the next `fail_next` messages with 451"""
+
+    def __init__(self):
+        self.connections = 0
+        self.delivered = []
+        self.fail_next = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.fail_next:
+            self.fail_next -= 1
+            return "451 Try again later"
+        self.delivered.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+async def message(outbox_id) -> dict:
+    return await outbox.email_outbox_collection.find_one({"_id": outbox_id})
+
+
+async def make_due(outbox_id):
+    await outbox.email_outbox_collection.update_one(
+        {"_id": outbox_id}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+
+
+def finished(doc: dict) -> bool:
+    return "html" not in doc and doc.get("expires_at") is not None
+
+
+async def run(handler: RecordingHandler) -> list:
+    sender = outbox.OutboxSender()
+    checks = []
+
+    ids = [await outbox.enqueue_email(f"user{i}@example.com", "Reset", f"<a href='/reset/{i}'>reset</a>", SENDER)
+           for i in range(5)]
+    await sender.process_once()
+    docs = [await message(outbox_id) for outbox_id in ids]
+    checks.append(("batch delivered", len(handler.delivered) == 5 and all(doc["status"] == "sent" for doc in docs)))
+    checks.append(("one connection for the batch", handler.connections == 1))
+    checks.append(("sent messages scrubbed and expiring", all(finished(doc) for doc in docs)))
+
+    handler.fail_next = 1
+    retried = await outbox.enqueue_email("retry@example.com", "Reset", "<a href='/reset/r'>reset</a>", SENDER)
+    await sender.process_once()
+    doc = await message(retried)
+    checks.append(("temporary failure rescheduled",
+                   doc["status"] == "pending" and doc["attempts"] == 1 and doc["next_attempt_at"] > datetime.utcnow()
+                   and "html" in doc))
+    await make_due(retried)
+    await sender.process_once()
+    doc = await message(retried)
+    checks.append(("retry delivered", doc["status"] == "sent" and "retry@example.com" in handler.delivered))
+    checks.append(("connection reopened after the failure", handler.connections == 2))
+
+    handler.fail_next = outbox.OUTBOX_MAX_ATTEMPTS
+    dead = await outbox.enqueue_email("dead@example.com", "Reset", "<a href='/reset/d'>reset</a>", SENDER)
+    for _ in range(outbox.OUTBOX_MAX_ATTEMPTS):
+        await make_due(dead)
+        await sender.process_once()
+    doc = await message(dead)
+    checks.append(("gave up after max attempts",
+                   doc["status"] == "failed" and doc["attempts"] == outbox.OUTBOX_MAX_ATTEMPTS))
+    checks.append(("failed message scrubbed and expiring", finished(doc)))
+
+    await sender.stop()
+    return checks
+
+
+async def main() -> int:
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=SMTP_PORT)
+    controller.start()
+    try:
+        checks = await run(handler)
+    finally:
+        controller.stop()
+
+    for name, ok in checks:
+        print(f"{'✅' if ok else '❌'} {name}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
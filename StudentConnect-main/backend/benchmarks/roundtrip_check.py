@@ -0,0 +1,199 @@
+"""
+Count MongoDB round trips per endpoint and fail when one goes over budget.
+
+A pymongo CommandListener counts every command the app sends while one
+request is handled; each endpoint has a budget in BUDGETS. Run it after
+touching the data layer so an extra read-after-write or a per-item query
+shows up as a failure instead of as latency in production.
+
+The feed is measured twice: served from the in-memory feed head
+(models/hot_feed.py), which needs no round trips, and from MongoDB, as when
+the feed head is stale or disabled.
+
+Point MONGODB_URL at a disposable server; the scratch database is dropped
+before and after the run. With MONGODB_URL=mongomock:// it runs against the
+in-memory stand-in, which emits no command events. Collection operations
+are counted instead (one per command on a real server), so it can run in CI
+without a database.
+
+Usage (from the backend directory, after pip install -r benchmarks/requirements.txt):
+    python -m benchmarks.roundtrip_check
+    MONGODB_URL=mongomock:// python -m benchmarks.roundtrip_check
+"""
+import asyncio
+import functools
+import os
+import sys
+import threading
+from pymongo import monitoring
+
+# Always a scratch database: the check drops it before and after running
+os.environ["DATABASE_NAME"] = os.getenv("ROUNDTRIP_CHECK_DATABASE", "studentconnect_roundtrip_check")
+os.environ["ENVIRONMENT"] = "benchmark"
+# The feed head is checked by hand below; its background check must not run
+# during a measurement
+os.environ["HOT_FEED_CHECK_SECONDS"] = "600"
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        self.commands.append(f"{event.command_name}:{event.command.get(event.command_name)}")
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class MockCommandCounter:
+    """Counts top-level operations on the in-memory stand-in's collections
+    into `commands`, for runs without a real MongoDB"""
+
+    OPERATIONS = (
+        "find", "find_one", "find_one_and_update", "find_one_and_replace", "find_one_and_delete",
+        "insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one",
+        "delete_many", "aggregate", "count_documents", "estimated_document_count", "distinct", "bulk_write",
+    )
+
+    def __init__(self, commands: list):
+        self.commands = commands
+        # Operations call each other internally; only the outermost is a command
+        self._depth = threading.local()
+
+    def install(self):
+        from mongomock.collection import Collection
+        for name in self.OPERATIONS:
+            setattr(Collection, name, self._counted(name, getattr(Collection, name)))
+
+    def _counted(self, name: str, operation):
+        @functools.wraps(operation)
+        def wrapper(collection, *args, **kwargs):
+            depth = getattr(self._depth, "value", 0)
+            if depth == 0:
+                self.commands.append(f"{name}:{collection.name}")
+            self._depth.value = depth + 1
+            try:
+                return operation(collection, *args, **kwargs)
+            finally:
+                self._depth.value = depth
+        return wrapper
+
+
+# Must be registered before models.database creates its client
+counter = CommandCounter()
+monitoring.register(counter)
+if os.getenv("MONGODB_URL", "").startswith("mongomock://"):
+    MockCommandCounter(counter.commands).install()
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from models.database import get_client, DATABASE_NAME  # noqa: E402
+from models.hot_feed import hot_feed  # noqa: E402
+
+USER = {"email": "roundtrip@example.com", "username": "roundtrip", "name": "Round Trip", "password": "roundtrippassword"}
+
+# Endpoint -> maximum MongoDB commands while serving it (auth user cache warm
+# unless noted)
+BUDGETS = {
+    "signup": 2,                      # conflict check, insert
+    "login": 1,                       # user lookup
+    "me (cold user cache)": 2,        # users version, user lookup, then cached
+    "me": 0,
+    "update profile": 2,              # findAndModify, users version
+    "user profile": 1,
+    "create post": 5,                 # insert, feed version, index: postings, df, stats
+    "feed (hot)": 0,                  # served from the in-memory feed head
+    "feed (hot, 304)": 0,
+    "feed (fallback)": 2,             # feed version, posts
+    "feed (fallback, 304)": 1,        # feed version only
+    "post": 1,
+    "post (304)": 1,                  # version fields only
+    "create comment": 3,              # insert, count on post, feed version
+    "create reply": 4,                # parent lookup + the above
+    "comments": 2,                    # post, comments
+    "comments (304)": 1,              # post (its comment count) only
+    "thread (depth 1)": 4,            # post, roots, replies per root (one root here), has-more check
+    "replies": 3,                     # parent comment, replies, has-more check
+}
+
+
+async def measure(results: dict, name: str, request) -> httpx.Response:
+    counter.commands.clear()
+    response = await request
+    results[name] = list(counter.commands)
+    if response.status_code >= 400:
+        raise RuntimeError(f"{name}: HTTP {response.status_code} {response.text}")
+    return response
+
+
+async def run(client: httpx.AsyncClient) -> dict:
+    results = {}
+    await measure(results, "signup", client.post("/api/auth/signup", json=USER))
+    login = await measure(results, "login", client.post(
+        "/api/auth/login", json={"email": USER["email"], "password": USER["password"]}))
+    client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+    await measure(results, "me (cold user cache)", client.get("/api/auth/me"))
+    await measure(results, "me", client.get("/api/auth/me"))
+    await measure(results, "user profile", client.get(f"/api/auth/user/{USER['username']}"))
+
+    post = await measure(results, "create post", client.post(
+        "/api/posts/", data={"title": "Round trips", "content": "Counting commands", "post_type": "threads"}))
+    post_id = post.json()["id"]
+    # The lifespan does not run here, so the feed head starts out stopped
+    feed = await measure(results, "feed (fallback)", client.get("/api/posts/"))
+    await measure(results, "feed (fallback, 304)", client.get(
+        "/api/posts/", headers={"If-None-Match": feed.headers["etag"]}))
+    hot_feed.start()
+    try:
+        await hot_feed.check()
+        feed = await measure(results, "feed (hot)", client.get("/api/posts/"))
+        await measure(results, "feed (hot, 304)", client.get(
+            "/api/posts/", headers={"If-None-Match": feed.headers["etag"]}))
+    finally:
+        await hot_feed.stop()
+    detail = await measure(results, "post", client.get(f"/api/posts/{post_id}"))
+    await measure(results, "post (304)", client.get(
+        f"/api/posts/{post_id}", headers={"If-None-Match": detail.headers["etag"]}))
+
+    comment = await measure(results, "create comment", client.post(
+        "/api/comments/", json={"content": "First", "post_id": post_id}))
+    comment_id = comment.json()["id"]
+    await measure(results, "create reply", client.post(
+        "/api/comments/", json={"content": "Reply", "post_id": post_id, "parent_comment_id": comment_id}))
+    comments = await measure(results, "comments", client.get(f"/api/comments/{post_id}"))
+    await measure(results, "comments (304)", client.get(
+        f"/api/comments/{post_id}", headers={"If-None-Match": comments.headers["etag"]}))
+    await measure(results, "thread (depth 1)", client.get(f"/api/comments/{post_id}/thread", params={"depth": 1}))
+    await measure(results, "replies", client.get(f"/api/comments/{post_id}/replies/{comment_id}", params={"depth": 0}))
+
+    await measure(results, "update profile", client.put("/api/auth/profile", json={"bio": "Counting"}))
+    return results
+
+
+async def main() -> int:
+    await get_client().drop_database(DATABASE_NAME)
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://roundtrip") as client:
+            results = await run(client)
+    finally:
+        await get_client().drop_database(DATABASE_NAME)
+
+    failures = 0
+    for name, budget in BUDGETS.items():
+        commands = results[name]
+        ok = len(commands) <= budget
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} {name}: {len(commands)} round trips (budget {budget})")
+        if not ok:
+            for command in commands:
+                print(f"     {command}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
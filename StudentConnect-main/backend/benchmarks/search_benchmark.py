@@ -0,0 +1,112 @@
+"""
+Compare the ranked search index with the legacy unanchored $regex scan.
+
+Seeds a scratch database with synthetic posts, builds the inverted index and
+times both paths over the same queries. Point MONGODB_URL at a disposable
+MongoDB; the scratch database is dropped afterwards unless --keep is given.
+
+Usage (from the backend directory):
+    python -m benchmarks.search_benchmark --posts 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+# Always a scratch database: the benchmark drops it before and after running
+os.environ["DATABASE_NAME"] = os.getenv("SEARCH_BENCH_DATABASE", "studentconnect_search_bench")
+
+from models.database import database, posts_collection  # noqa: E402
+from models.indexes import ensure_indexes  # noqa: E402
+from models.search import rebuild_search_index, search_posts  # noqa: E402
+
+WORDS = (
+    "algorithms calculus physics chemistry biology notes exam midterm final lecture "
+    "internship referral backend frontend python java react machine learning data "
+    "science systems networks security databases compilers design thermodynamics "
+    "statistics economics marketing finance startup remote onsite summer winter"
+).split()
+NAMES = ["Asha", "Ravi", "Meera", "John", "Priya", "Kiran", "Sara", "Dev", "Nina", "Omar"]
+POST_TYPES = ["notes", "jobs", "threads"]
+QUERIES = ["python", "machine learning", "calc", "priya", "internship remote", "datab", "exam notes"]
+
+
+def synthetic_post(i: int, now: datetime) -> dict:
+    name = random.choice(NAMES)
+    return {
+        "title": " ".join(random.choices(WORDS, k=random.randint(3, 8))).title(),
+        "content": " ".join(random.choices(WORDS, k=60)),
+        "post_type": random.choice(POST_TYPES),
+        "tags": random.sample(WORDS, k=3),
+        "author_id": str(i % 5000),
+        "author_name": f"{name} {random.choice(NAMES)}",
+        "author_username": f"{name.lower()}{i % 5000}",
+        "author_profile_picture": "",
+        "comments_count": 0,
+        "created_at": now - timedelta(seconds=i),
+        "updated_at": now - timedelta(seconds=i),
+    }
+
+
+async def seed(count: int, batch_size: int = 5000):
+    now = datetime.utcnow()
+    for start in range(0, count, batch_size):
+        batch = [synthetic_post(i, now) for i in range(start, min(start + batch_size, count))]
+        await posts_collection.insert_many(batch, ordered=False)
+    print(f"Seeded {count} posts")
+
+
+async def regex_search(search: str, limit: int = 20):
+    """The pre-index implementation of get_posts(search=...)"""
+    query = {"$or": [
+        {"title": {"$regex": search, "$options": "i"}},
+        {"tags": {"$regex": search, "$options": "i"}},
+        {"author_name": {"$regex": search, "$options": "i"}},
+        {"author_username": {"$regex": search, "$options": "i"}}
+    ]}
+    cursor = posts_collection.find(query).sort("created_at", -1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def time_queries(label: str, search_fn, repeats: int) -> dict:
+    timings = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            started = time.perf_counter()
+            await search_fn(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    result = {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": timings[int(len(timings) * 0.95) - 1],
+        "max_ms": timings[-1],
+    }
+    print(f"{label:>8}: p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms  max {result['max_ms']:.1f} ms")
+    return result
+
+
+async def main(args):
+    await database.client.drop_database(database.name)
+    await ensure_indexes()
+    await seed(args.posts)
+    started = time.perf_counter()
+    await rebuild_search_index(batch_size=2000)
+    print(f"Index built in {time.perf_counter() - started:.1f}s")
+
+    try:
+        await time_queries("regex", regex_search, args.repeats)
+        await time_queries("indexed", search_posts, args.repeats)
+    finally:
+        if not args.keep:
+            await database.client.drop_database(database.name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""
+Compare the two ways of turning post documents into a JSON response body.
+
+    before  build a PostResponse per document, then let FastAPI validate the
+            list against response_model and render it with JSONResponse
+    after   map documents straight to dicts (models/serializers.py) and
+            render them with ORJSONResponse
+
+No database is needed; documents are generated in memory.
+
+Usage (from the backend directory):
+    python -m benchmarks.serialization_benchmark --posts 100 --rounds 200
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+from bson import ObjectId
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from models.schemas import PostResponse
+from models.serializers import post_to_wire
+
+WORDS = "lecture notes exam internship python backend react calculus physics remote".split()
+
+
+def synthetic_post(i: int, now: datetime) -> dict:
+    created_at = now - timedelta(minutes=i)
+    return {
+        "_id": ObjectId(),
+        "title": " ".join(random.choices(WORDS, k=6)).title(),
+        "content": " ".join(random.choices(WORDS, k=random.randint(50, 400))),
+        "post_type": random.choice(["notes", "jobs", "threads"]),
+        "tags": random.sample(WORDS, 3),
+        "author_id": str(ObjectId()),
+        "author_name": "Priya Raman",
+        "author_username": "priya",
+        "author_profile_picture": "https://res.cloudinary.com/demo/image/upload/profile.jpg",
+        "document_url": None,
+        "document_name": None,
+        "job_link": "https://example.com/apply",
+        "company": "Acme",
+        "location": "Remote",
+        "comments_count": random.randint(0, 40),
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+LIST_FIELD = create_response_field(name="Response_posts", type_=List[PostResponse])
+
+
+async def render_before(posts: list) -> bytes:
+    responses = [
+        PostResponse(
+            id=str(post["_id"]),
+            title=post["title"],
+            content=post["content"],
+            post_type=post["post_type"],
+            tags=post.get("tags", []),
+            author_id=post["author_id"],
+            author_name=post["author_name"],
+            author_username=post["author_username"],
+            author_profile_picture=post.get("author_profile_picture", ""),
+            document_url=post.get("document_url"),
+            document_name=post.get("document_name"),
+            job_link=post.get("job_link"),
+            company=post.get("company"),
+            location=post.get("location"),
+            comments_count=post.get("comments_count", 0),
+            created_at=post["created_at"],
+            updated_at=post["updated_at"]
+        )
+        for post in posts
+    ]
+    content = await serialize_response(field=LIST_FIELD, response_content=responses)
+    return JSONResponse(content).body
+
+
+async def render_after(posts: list) -> bytes:
+    return ORJSONResponse([post_to_wire(post) for post in posts]).body
+
+
+async def time_path(render, posts: list, rounds: int) -> list:
+    await render(posts)  # warm-up
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await render(posts)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=100, help="posts per response")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    now = datetime.utcnow()
+    posts = [synthetic_post(i, now) for i in range(args.posts)]
+
+    print(f"Rendering {args.posts} posts, {args.rounds} rounds")
+    results = {}
+    for name, render in (("before", render_before), ("after", render_after)):
+        timings = await time_path(render, posts, args.rounds)
+        results[name] = statistics.median(timings)
+        print(f"{name:>6}: median {results[name]:.2f}ms  p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.2f}ms")
+    print(f"speedup: {results['before'] / results['after']:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Cold-start time: how long `import main` takes, and how long until GET /
+first answers 200 from a freshly started uvicorn.
+
+Render's free plan spins the service down when idle, so the next visitor
+waits for the whole cold start. Each sample runs in a new Python process,
+as a cold start does. By default the app uses the in-memory Mongo stand-in,
+so the numbers do not depend on network latency to the database. Pass
+--mongodb-url to include the real connection and index bootstrap.
+
+--top lists the modules that take longest to import, from
+python -X importtime.
+
+Usage (from the backend directory, after pip install -r benchmarks/requirements.txt):
+    python -m benchmarks.startup_benchmark --runs 5
+    python -m benchmarks.startup_benchmark --top 15
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def app_env(mongodb_url: str) -> dict:
+    env = dict(os.environ, MONGODB_URL=mongodb_url, ENVIRONMENT="benchmark", OUTBOX_SENDER_ENABLED="false")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def import_time(env: dict) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response_time(env: dict, timeout: float = 60.0) -> float:
+    """Milliseconds from spawning uvicorn to the first 200 from GET /"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                pass
+            time.sleep(0.005)
+        raise RuntimeError(f"No response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def slowest_imports(env: dict, top: int) -> list:
+    """(self ms, cumulative ms, module) for the slowest imports of main"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        rows.append((int(self_us) / 1000, int(cumulative_us) / 1000, module.rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def summarize(label: str, samples: list):
+    print(f"{label:<24} median {statistics.median(samples):7.1f} ms   min {min(samples):7.1f} ms   max {max(samples):7.1f} ms")
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mongodb-url", default="mongomock://")
+    parser.add_argument("--top", type=int, default=0, help="also list the N slowest module imports")
+    args = parser.parse_args(argv)
+
+    env = app_env(args.mongodb_url)
+    import_time(env)  # compile bytecode once so every run starts from the same state
+    summarize("import main", [import_time(env) for _ in range(args.runs)])
+    summarize("first GET / response", [first_response_time(env) for _ in range(args.runs)])
+
+    if args.top:
+        print(f"\n{'self ms':>8} {'cumul ms':>9}  module")
+        for self_ms, cumulative_ms, module in slowest_imports(env, args.top):
+            print(f"{self_ms:8.1f} {cumulative_ms:9.1f}  {module}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,15 +1,43 @@
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-from fastapi import FastAPI
+import secrets
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from routes import auth, posts, comments
+from models.database import connect_database, close_database
+from models.hot_feed import start_hot_feed, stop_hot_feed
+from utils.load_shedding import ConcurrencyLimitMiddleware, concurrency_limits, route_groups
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, RequestMetricsMiddleware, registry as metrics_registry
+from utils.mongo_metrics import pool_metrics
+from utils.outbox import start_outbox_sender, stop_outbox_sender
+from utils.slow_queries import SORT_FIELDS as SLOW_QUERY_SORTS, start_slow_query_log, stop_slow_query_log, top_slow_queries
+from utils.settings import settings
+from utils.storage import STORAGE_BACKEND, MEDIA_ROOT, UploadSizeLimitMiddleware, upload_limits
+import utils.warmup as warmup
 
-# Load environment variables from .env file in the same directory as main.py
-env_path = Path(__file__).parent / '.env'
-load_dotenv(dotenv_path=env_path)
+OUTBOX_SENDER_ENABLED = settings.outbox_sender_enabled
+ADMIN_API_TOKEN = settings.admin_api_token
 
-app = FastAPI(title="StudentConnect API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    email_configured = bool(settings.gmail_user and settings.gmail_app_password)
+    print(f"✅ Starting in {settings.environment} mode (email {'configured' if email_configured else 'not configured'}, frontend {settings.frontend_url})")
+    connect_database()
+    start_slow_query_log()
+    # Loaded by the warmup, then kept current in the background
+    start_hot_feed()
+    # Runs in the background: / answers at once, /ready once warm
+    warmup.start_warmup()
+    if OUTBOX_SENDER_ENABLED:
+        start_outbox_sender()
+    yield
+    await warmup.stop_warmup()
+    await stop_hot_feed()
+    await stop_outbox_sender()
+    await stop_slow_query_log()
+    close_database()
+
+app = FastAPI(title="StudentConnect API", version="1.0.0", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -18,12 +46,56 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+app.add_middleware(UploadSizeLimitMiddleware, limits=upload_limits())
+# Outside the upload cap so a shed upload is turned away before its body is read
+app.add_middleware(ConcurrencyLimitMiddleware, limits=concurrency_limits(), groups=route_groups())
+# Added last so it is outermost and also times CORS, upload and shed rejections
+app.add_middleware(RequestMetricsMiddleware)
+
+if STORAGE_BACKEND == "local":
+    from utils.storage import MediaFiles
+    MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
+    app.mount("/media", MediaFiles(directory=MEDIA_ROOT), name="media")
 
 @app.get("/")
 def read_root():
+    """Liveness: the process is up (see /ready for whether it can serve)"""
     return {"message": "StudentConnect Backend is running!"}
 
+@app.get("/ready")
+async def readiness():
+    """200 once the startup warmup is done and MongoDB answers; 503 before that"""
+    if warmup.warmup is None:
+        report = {"ready": False, "steps": {}}
+    else:
+        report = await warmup.warmup.check()
+    if not report["ready"]:
+        return ORJSONResponse(report, status_code=503, headers={"Retry-After": "1"})
+    return report
+
+@app.get("/metrics", response_class=Response)
+def prometheus_metrics():
+    """Request, MongoDB command, cache and bcrypt metrics in Prometheus text format"""
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/metrics/pool")
+def mongo_pool_metrics():
+    """MongoDB connection pool usage and checkout wait times (utils/mongo_metrics.py)"""
+    return pool_metrics.snapshot()
+
+@app.get("/metrics/slow-queries")
+async def slow_query_shapes(
+    limit: int = Query(20, ge=1, le=200),
+    sort: str = Query("total_ms", pattern=f"^({'|'.join(SLOW_QUERY_SORTS)})$"),
+    x_admin_token: str = Header("")
+):
+    """Slowest MongoDB query shapes recorded by utils/slow_queries.py"""
+    if not ADMIN_API_TOKEN or not secrets.compare_digest(x_admin_token, ADMIN_API_TOKEN):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return await top_slow_queries(limit, sort)
+
 # Include routers
 app.include_router(auth.router, prefix="/api")
 app.include_router(posts.router, prefix="/api")
@@ -0,0 +1,48 @@
+"""
+Copy each author's current profile picture onto their posts.
+
+Replaces the old update_posts_profile_pics.py script. Each batch joins its
+posts to users with one $lookup, and only posts whose picture differs get
+an update.
+"""
+from pymongo import UpdateOne
+from models.database import posts_collection, users_collection
+from migrations.runner import Migration
+
+
+class BackfillPostAuthorPictures(Migration):
+    description = "Set posts.author_profile_picture from the author's profile"
+    collection = posts_collection
+
+    async def plan_batch(self, after_id, batch_size: int):
+        match = {"author_username": {"$exists": True}}
+        if after_id is not None:
+            match["_id"] = {"$gt": after_id}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"_id": 1}},
+            {"$limit": batch_size},
+            {"$project": {"author_username": 1, "author_profile_picture": 1}},
+            {"$lookup": {
+                "from": users_collection.name,
+                "localField": "author_username",
+                "foreignField": "username",
+                "as": "author"
+            }},
+            {"$project": {"author_profile_picture": 1, "author.profile_picture": 1}}
+        ]
+        posts = await posts_collection.aggregate(pipeline).to_list(length=batch_size)
+        if not posts:
+            return [], after_id, 0
+
+        operations = []
+        for post in posts:
+            if not post["author"]:
+                continue  # author no longer exists
+            picture = post["author"][0].get("profile_picture", "")
+            if post.get("author_profile_picture") != picture:
+                operations.append(UpdateOne({"_id": post["_id"]}, {"$set": {"author_profile_picture": picture}}))
+        return operations, posts[-1]["_id"], len(posts)
+
+
+migration = BackfillPostAuthorPictures()
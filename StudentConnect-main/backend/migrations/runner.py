@@ -0,0 +1,174 @@
+"""
+Online data migrations.
+
+Each migration is a module in this directory named NNNN_description.py that
+defines `migration`, an instance of a Migration subclass. Migrations run in
+file order. They walk their collection in _id order, one batch at a time,
+and write each batch with a single unordered bulk_write. Progress is
+checkpointed in the `migrations` collection after every batch. A migration
+that crashed or was stopped resumes after the last _id it finished, and
+completed migrations are skipped.
+
+Writes are throttled to --ops-per-second so a backfill can run against the
+live primary. --dry-run computes every batch and reports how many documents
+would change, without writing anything or touching the checkpoints.
+
+Usage (from the backend directory):
+    python -m migrations.runner --list
+    python -m migrations.runner --dry-run
+    python -m migrations.runner [--only 0001] [--batch-size 500] [--ops-per-second 1000]
+"""
+import abc
+import argparse
+import asyncio
+import importlib
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from models.database import database
+
+migrations_collection = database.get_collection("migrations")
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_OPS_PER_SECOND = 1000
+
+_MODULE_RE = re.compile(r"^(\d{4})_\w+$")
+
+
+class Migration(abc.ABC):
+    """Base class: subclasses set `collection` and implement `plan_batch`.
+    A subclass without plan_batch cannot be instantiated, so its module
+    fails to import in discover() before anything runs."""
+
+    description = ""
+    collection = None
+
+    @abc.abstractmethod
+    async def plan_batch(self, after_id, batch_size: int):
+        """Return (write operations, last _id scanned, documents scanned) for
+        the next batch_size documents after `after_id` (None = from the start)"""
+
+
+def discover() -> list:
+    """(migration id, Migration) for every migration module, in order"""
+    found = []
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        if _MODULE_RE.match(path.stem):
+            module = importlib.import_module(f"migrations.{path.stem}")
+            if not isinstance(getattr(module, "migration", None), Migration):
+                raise TypeError(f"{path.name} must define `migration`, an instance of a Migration subclass")
+            found.append((path.stem, module.migration))
+    return found
+
+
+async def _throttle(started: float, ops: int, ops_per_second: float):
+    """Sleep long enough that `ops` writes since `started` stay under the rate"""
+    if ops_per_second > 0:
+        remaining = ops / ops_per_second - (time.perf_counter() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+
+async def run_migration(
+    migration_id: str,
+    migration: Migration,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    ops_per_second: float = DEFAULT_OPS_PER_SECOND,
+    dry_run: bool = False
+) -> dict:
+    """Run (or resume) one migration; returns its counters"""
+    checkpoint = await migrations_collection.find_one({"_id": migration_id}) or {}
+    if checkpoint.get("status") == "done":
+        print(f"✅ {migration_id}: already applied")
+        return checkpoint
+
+    after_id = None if dry_run else checkpoint.get("last_id")
+    counts = {
+        "scanned": 0 if dry_run else checkpoint.get("scanned", 0),
+        "modified": 0 if dry_run else checkpoint.get("modified", 0),
+    }
+    if after_id is not None:
+        print(f"⏳ {migration_id}: resuming after {after_id}")
+    elif not dry_run:
+        await migrations_collection.update_one(
+            {"_id": migration_id},
+            {"$set": {"status": "running", "description": migration.description, "started_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    while True:
+        started = time.perf_counter()
+        operations, last_id, scanned = await migration.plan_batch(after_id, batch_size)
+        if not scanned:
+            break
+        counts["scanned"] += scanned
+
+        if dry_run:
+            counts["modified"] += len(operations)
+        else:
+            if operations:
+                result = await migration.collection.bulk_write(operations, ordered=False)
+                counts["modified"] += result.modified_count
+            await migrations_collection.update_one(
+                {"_id": migration_id},
+                {"$set": {"last_id": last_id, **counts, "updated_at": datetime.utcnow()}}
+            )
+            await _throttle(started, len(operations), ops_per_second)
+
+        after_id = last_id
+        print(f"⏳ {migration_id}: scanned {counts['scanned']}, {'would modify' if dry_run else 'modified'} {counts['modified']}")
+
+    if dry_run:
+        print(f"🔎 {migration_id}: {counts['modified']} of {counts['scanned']} documents would change")
+    else:
+        await migrations_collection.update_one(
+            {"_id": migration_id},
+            {"$set": {"status": "done", **counts, "finished_at": datetime.utcnow()}}
+        )
+        print(f"🎉 {migration_id}: modified {counts['modified']} of {counts['scanned']} documents")
+    return counts
+
+
+async def run_all(only: Optional[str] = None, **options):
+    for migration_id, migration in discover():
+        if only and not migration_id.startswith(only):
+            continue
+        await run_migration(migration_id, migration, **options)
+
+
+async def list_migrations():
+    applied = {doc["_id"]: doc async for doc in migrations_collection.find()}
+    for migration_id, migration in discover():
+        status = applied.get(migration_id, {}).get("status", "pending")
+        print(f"{migration_id:<45} {status:<8} {migration.description}")
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Run pending data migrations")
+    parser.add_argument("--list", action="store_true", help="show migrations and their status")
+    parser.add_argument("--only", help="run only the migration whose id starts with this")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--ops-per-second", type=float, default=DEFAULT_OPS_PER_SECOND,
+                        help="write rate limit; 0 disables throttling")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        asyncio.run(list_migrations())
+        return 0
+    asyncio.run(run_all(
+        only=args.only,
+        batch_size=args.batch_size,
+        ops_per_second=args.ops_per_second,
+        dry_run=args.dry_run
+    ))
+    return 0
+
+
+if __name__ == "__main__":
+    # Run the imported module, whose Migration class the migration modules subclass
+    from migrations.runner import main
+    sys.exit(main(sys.argv[1:]))
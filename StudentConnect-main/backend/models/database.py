@@ -1,34 +1,143 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from pymongo import ReadPreference, ReturnDocument
 from typing import Optional
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
+from utils.mongo_metrics import command_metrics, pool_metrics
+from utils.slow_queries import SLOW_QUERY_LOG_ENABLED, slow_query_log
+from utils.pagination import FEED_SORT, THREAD_SORT, after_cursor
+from utils.settings import settings
 
 # MongoDB connection
-MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-DATABASE_NAME = os.getenv("DATABASE_NAME", "haripriya_db")
+MONGODB_URL = settings.mongodb_url
+DATABASE_NAME = settings.database_name
+
+# Connection pool; size it against request concurrency using /metrics/pool
+MONGO_MAX_POOL_SIZE = settings.mongo_max_pool_size
+MONGO_MIN_POOL_SIZE = settings.mongo_min_pool_size
+MONGO_MAX_IDLE_TIME_MS = settings.mongo_max_idle_time_ms
+MONGO_WAIT_QUEUE_TIMEOUT_MS = settings.mongo_wait_queue_timeout_ms
+MONGO_SERVER_SELECTION_TIMEOUT_MS = settings.mongo_server_selection_timeout_ms
+MONGO_CONNECT_TIMEOUT_MS = settings.mongo_connect_timeout_ms
+MONGO_SOCKET_TIMEOUT_MS = settings.mongo_socket_timeout_ms
+# Read preference for feed listings; e.g. secondaryPreferred to move them off the primary
+FEED_READ_PREFERENCE = settings.feed_read_preference
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+_client = None
+
+
+def _redacted_url(url: str) -> str:
+    """MONGODB_URL without its password, for logs"""
+    scheme, sep, rest = url.partition("://")
+    credentials, at, host = rest.rpartition("@")
+    if not at:
+        return url
+    return f"{scheme}{sep}{credentials.split(':')[0]}:***@{host}"
+
+
+def connect_database():
+    """Create the Motor client; called from the lifespan in main.py, or lazily
+    on first use by scripts that never run one"""
+    global _client
+    if _client is not None:
+        return _client
+    if MONGODB_URL.startswith("mongomock://"):
+        # In-memory stand-in used by the benchmarks (see benchmarks/requirements.txt)
+        from mongomock_motor import AsyncMongoMockClient
+        _client = AsyncMongoMockClient()
+    else:
+        _client = AsyncIOMotorClient(
+            MONGODB_URL,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            event_listeners=[pool_metrics, command_metrics] + ([slow_query_log] if SLOW_QUERY_LOG_ENABLED else [])
+        )
+    print(f"✅ MongoDB client created for {_redacted_url(MONGODB_URL)}/{DATABASE_NAME} (pool {MONGO_MIN_POOL_SIZE}-{MONGO_MAX_POOL_SIZE})")
+    return _client
+
+
+def close_database():
+    global _client
+    # The in-memory stand-in keeps its data only as long as the client lives
+    if _client is not None and not MONGODB_URL.startswith("mongomock://"):
+        _client.close()
+        _client = None
+
 
-print("=== DATABASE CONFIGURATION ===")
-print(f"MongoDB URL: {MONGODB_URL}")
-print(f"Database Name: {DATABASE_NAME}")
-print("=== END DATABASE CONFIGURATION ===")
+def get_client():
+    return connect_database()
 
-try:
-    client = AsyncIOMotorClient(MONGODB_URL)
-    database = client[DATABASE_NAME]
-    print("✅ Database connection initialized successfully")
-except Exception as e:
-    print(f"❌ Database connection error: {e}")
+
+class _LazyDatabase:
+    """Stands in for the Motor database until a client exists, so modules can
+    keep module-level collection handles while the lifespan owns the client"""
+
+    def __getattr__(self, attr):
+        return getattr(get_client()[DATABASE_NAME], attr)
+
+    def get_collection(self, name: str, read_preference=None):
+        return _LazyCollection(name, read_preference)
+
+
+class _LazyCollection:
+    def __init__(self, name: str, read_preference=None):
+        self._name = name
+        self._read_preference = read_preference
+        self._client = None
+        self._resolved = None
+
+    def _collection(self):
+        client = get_client()
+        if client is not self._client:
+            collection = client[DATABASE_NAME].get_collection(self._name)
+            if self._read_preference is not None:
+                collection = collection.with_options(read_preference=self._read_preference)
+            self._client, self._resolved = client, collection
+        return self._resolved
+
+    def __getattr__(self, attr):
+        return getattr(self._collection(), attr)
+
+
+database = _LazyDatabase()
 
 # Collections
 users_collection = database.get_collection("users")
 posts_collection = database.get_collection("posts")
 comments_collection = database.get_collection("comments")
+counters_collection = database.get_collection("counters")
+# Feed listings may read from secondaries. The feed version is read the same
+# way so an ETag never gets ahead of the posts it describes on that member.
+_feed_read_preference = None if FEED_READ_PREFERENCE == "primary" else READ_PREFERENCES[FEED_READ_PREFERENCE]
+feed_posts_collection = database.get_collection("posts", _feed_read_preference)
+feed_counters_collection = database.get_collection("counters", _feed_read_preference)
+
+# Counter bumped whenever anything shown in the feed changes; feed ETags are built from it
+FEED_VERSION_ID = "feed"
+# Counter bumped on profile edits when authors are resolved at read time (utils/authors.py)
+AUTHORS_VERSION_ID = "authors"
+# Counter bumped whenever a user document changes, for the auth cache (utils/auth.py)
+USERS_VERSION_ID = "users"
+
+# Called as listener(version, changed) after every feed version bump, where
+# `changed` is a new post, {_id, changed fields} of an existing one, or None
+# when the change is not described (models/hot_feed.py)
+feed_change_listeners = []
 
 async def test_database_connection():
     """Test database connection"""
@@ -44,6 +153,14 @@ async def test_database_connection():
 def create_object_id():
     return str(ObjectId())
 
+def as_stored(document: dict) -> dict:
+    """Round top-level datetimes down to milliseconds, the precision BSON
+    keeps, so a document returned straight from a write matches a later read"""
+    for key, value in document.items():
+        if isinstance(value, datetime):
+            document[key] = value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return document
+
 async def get_user_by_email(email: str):
     return await users_collection.find_one({"email": email})
 
@@ -53,49 +170,148 @@ async def get_user_by_id(user_id: str):
 async def get_user_by_username(username: str):
     return await users_collection.find_one({"username": username})
 
+async def get_users_by_ids(user_ids: list, projection: Optional[dict] = None):
+    cursor = users_collection.find({"_id": {"$in": user_ids}}, projection)
+    return await cursor.to_list(length=None)
+
+async def find_user_conflict(email: str, username: str):
+    """Any user already holding this email or username (only those two fields)"""
+    return await users_collection.find_one(
+        {"$or": [{"email": email}, {"username": username}]},
+        {"email": 1, "username": 1}
+    )
+
+# Write helpers return the document as written (insert_one fills in _id)
+# instead of reading it back
 async def create_user(user_data: dict):
-    result = await users_collection.insert_one(user_data)
-    return await users_collection.find_one({"_id": result.inserted_id})
+    user_data = as_stored(user_data)
+    await users_collection.insert_one(user_data)
+    return user_data
 
 async def update_user(user_id: str, update_data: dict):
-    await users_collection.update_one(
+    return await users_collection.find_one_and_update(
         {"_id": ObjectId(user_id)}, 
-        {"$set": update_data}
+        {"$set": as_stored(update_data)},
+        return_document=ReturnDocument.AFTER
     )
-    return await get_user_by_id(user_id)
 
 async def create_post(post_data: dict):
-    result = await posts_collection.insert_one(post_data)
-    return await posts_collection.find_one({"_id": result.inserted_id})
+    post_data = as_stored(post_data)
+    await posts_collection.insert_one(post_data)
+    await bump_feed_version(post_data)
+    return post_data
+
+async def get_version(counter_id: str) -> int:
+    counter = await counters_collection.find_one({"_id": counter_id})
+    return counter["version"] if counter else 0
+
+async def bump_version(counter_id: str) -> int:
+    counter = await counters_collection.find_one_and_update(
+        {"_id": counter_id},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return counter["version"]
+
+async def get_feed_version() -> int:
+    counter = await feed_counters_collection.find_one({"_id": FEED_VERSION_ID})
+    return counter["version"] if counter else 0
 
-async def get_posts(skip: int = 0, limit: int = 20, post_type: Optional[str] = None, search: Optional[str] = None):
+async def bump_feed_version(changed: Optional[dict] = None) -> int:
+    version = await bump_version(FEED_VERSION_ID)
+    for listener in feed_change_listeners:
+        listener(version, changed)
+    return version
+
+async def get_posts(skip: int = 0, limit: int = 20, post_type: Optional[str] = None, cursor: Optional[str] = None, projection: Optional[dict] = None):
+    # Text search is served by models/search.py, not by this helper
     query = {}
     
     if post_type:
         query["post_type"] = post_type
     
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"tags": {"$regex": search, "$options": "i"}},
-            {"author_name": {"$regex": search, "$options": "i"}},
-            {"author_username": {"$regex": search, "$options": "i"}}
-        ]
+    # A cursor replaces skip: the range predicate keeps every page the same cost
+    if cursor:
+        query.update(after_cursor(cursor))
+        skip = 0
     
-    cursor = posts_collection.find(query).sort("created_at", -1).skip(skip).limit(limit)
-    return await cursor.to_list(length=limit)
+    db_cursor = feed_posts_collection.find(query, projection).sort(FEED_SORT).skip(skip).limit(limit)
+    return await db_cursor.to_list(length=limit)
+
+async def get_post_contents(post_ids: list):
+    """Map post _id -> content, for callers that projected the content away"""
+    cursor = posts_collection.find({"_id": {"$in": post_ids}}, {"content": 1})
+    return {post["_id"]: post.get("content", "") async for post in cursor}
 
-async def get_post_by_id(post_id: str):
-    return await posts_collection.find_one({"_id": ObjectId(post_id)})
+async def get_post_by_id(post_id: str, projection: Optional[dict] = None):
+    return await posts_collection.find_one({"_id": ObjectId(post_id)}, projection)
 
 async def create_comment(comment_data: dict):
-    result = await comments_collection.insert_one(comment_data)
-    return await comments_collection.find_one({"_id": result.inserted_id})
+    """Insert a comment and count it on its post; returns None (and removes
+    the comment again) if the post does not exist"""
+    try:
+        post_id = ObjectId(comment_data["post_id"])
+    except InvalidId:
+        return None
+    comment_data = as_stored(comment_data)
+    await comments_collection.insert_one(comment_data)
+    # The count moves only after the comment is readable: post ETags are
+    # built from it. Updating the post doubles as the existence check
+    post = await posts_collection.find_one_and_update(
+        {"_id": post_id},
+        {"$inc": {"comments_count": 1}},
+        projection={"comments_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if post is None:
+        await comments_collection.delete_one({"_id": comment_data["_id"]})
+        return None
+    # Feed items show the comment count
+    await bump_feed_version(post)
+    return comment_data
+
+async def get_comment_by_id(comment_id: str):
+    return await comments_collection.find_one({"_id": ObjectId(comment_id)})
+
+async def get_child_comments(post_id: str, parent_id: Optional[str], limit: int, cursor: Optional[str] = None):
+    """One page of a comment's direct replies (roots when parent_id is None), oldest first"""
+    query = {"post_id": post_id, "parent_comment_id": parent_id}
+    if cursor:
+        query.update(after_cursor(cursor, descending=False))
+    db_cursor = comments_collection.find(query).sort(THREAD_SORT).limit(limit)
+    return await db_cursor.to_list(length=limit)
+
+async def get_first_replies(post_id: str, parent_ids: list, per_parent: int):
+    """Map each parent id with replies to its oldest `per_parent` replies.
+
+    One limited query per parent, run concurrently. Each reads at most
+    `per_parent` entries of the post_id_parent_created_at_id index, so a
+    parent with thousands of replies costs the same as one with a few.
+    """
+    pages = await asyncio.gather(*(
+        get_child_comments(post_id, parent_id, per_parent) for parent_id in parent_ids
+    ))
+    return {parent_id: replies for parent_id, replies in zip(parent_ids, pages) if replies}
+
+async def get_parents_with_replies(post_id: str, parent_ids: list):
+    """Subset of parent_ids that have at least one reply"""
+    pipeline = [
+        {"$match": {"post_id": post_id, "parent_comment_id": {"$in": parent_ids}}},
+        {"$group": {"_id": "$parent_comment_id"}}
+    ]
+    groups = await comments_collection.aggregate(pipeline).to_list(length=None)
+    return {group["_id"] for group in groups}
 
 async def get_comments_by_post_id(post_id: str):
     cursor = comments_collection.find({"post_id": post_id}).sort("created_at", 1)
     return await cursor.to_list(length=None)
 
-async def get_user_posts(user_id: str, skip: int = 0, limit: int = 20):
-    cursor = posts_collection.find({"author_id": user_id}).sort("created_at", -1).skip(skip).limit(limit)
-    return await cursor.to_list(length=limit)
+async def get_user_posts(user_id: str, skip: int = 0, limit: int = 20, cursor: Optional[str] = None, projection: Optional[dict] = None):
+    query = {"author_id": user_id}
+    if cursor:
+        query.update(after_cursor(cursor))
+        skip = 0
+    
+    db_cursor = feed_posts_collection.find(query, projection).sort(FEED_SORT).skip(skip).limit(limit)
+    return await db_cursor.to_list(length=limit)
@@ -0,0 +1,262 @@
+"""
+In-process materialized feed head.
+
+Most GET /api/posts/ traffic is the first page or two of the feed, for all
+posts or for one post_type, without a search. HotFeed keeps the newest
+HOT_FEED_SIZE posts of each of those listings in memory, in FEED_SORT
+order, with each post already serialized. When it is current, such pages
+(by skip or by cursor) are served without any database query.
+
+Staying current, including with several workers:
+- The feed version counter (models/database.py) is bumped on every change
+  the feed shows, and the bump returns the new version. A local change
+  is applied to the buffers only if it is exactly the next version;
+  otherwise another worker wrote in between. New posts are inserted in
+  order, and comment counts only ever grow to the newest value, so applying
+  a change twice is harmless.
+- A background task reads the feed version every HOT_FEED_CHECK_SECONDS and
+  reloads the buffers from MongoDB when it has moved past them (a write on
+  another worker, a profile picture change). It also reloads every
+  HOT_FEED_RESYNC_SECONDS regardless, and once during the startup warmup.
+- Pages are only served while the buffers match the newest version seen
+  and that version was checked within the last two intervals. Another
+  worker's writes therefore show up here within about
+  HOT_FEED_CHECK_SECONDS. Until then, and whenever the buffers are
+  stale, requests fall back to the database path.
+"""
+import asyncio
+import time
+from typing import NamedTuple, Optional
+from models.database import feed_change_listeners, get_feed_version, get_posts
+from models.schemas import PostType
+from models.serializers import post_to_wire
+from utils.authors import AUTHOR_HYDRATION
+from utils.fieldsets import make_excerpt
+from utils.metrics import registry
+from utils.pagination import decode_cursor
+from utils.settings import settings
+from utils.warmup import warmup_hook
+
+HOT_FEED_ENABLED = settings.hot_feed_enabled
+HOT_FEED_SIZE = settings.hot_feed_size
+HOT_FEED_CHECK_SECONDS = settings.hot_feed_check_seconds
+HOT_FEED_RESYNC_SECONDS = settings.hot_feed_resync_seconds
+
+# Buffer keys: None for the unfiltered feed, then one per post type
+LISTINGS = (None, *(post_type.value for post_type in PostType))
+
+hot_feed_requests = registry.counter(
+    "studentconnect_hot_feed_requests_total",
+    "Feed pages served from the in-memory feed head, or sent to MongoDB",
+    ("outcome",),
+)
+hot_feed_resyncs = registry.counter(
+    "studentconnect_hot_feed_resyncs_total",
+    "Reloads of the in-memory feed head from MongoDB",
+    ("reason",),
+)
+
+
+def _listing(post_type) -> Optional[str]:
+    return PostType(post_type).value if post_type else None
+
+
+def _sort_key(post: dict) -> tuple:
+    return (post["created_at"], post["_id"])
+
+
+class _Entry:
+    __slots__ = ("post", "wire")
+
+    def __init__(self, post: dict):
+        post = dict(post)
+        # Sparse views read the excerpt; posts stored before excerpts existed get one here
+        post.setdefault("excerpt", make_excerpt(post.get("content")))
+        self.post = post
+        # Author fields are resolved per request when they are not stored on the post
+        self.wire = None if AUTHOR_HYDRATION else post_to_wire(post)
+
+
+class _Buffer:
+    """Newest posts of one listing, newest first"""
+
+    def __init__(self, posts: list, complete: bool):
+        self.entries = [_Entry(post) for post in posts]
+        # True when the buffer holds every post of the listing
+        self.complete = complete
+
+    def insert(self, post: dict):
+        key = _sort_key(post)
+        for i, entry in enumerate(self.entries):
+            entry_key = _sort_key(entry.post)
+            if entry_key == key:
+                self.entries[i] = _Entry(post)
+                return
+            if entry_key < key:
+                break
+        else:
+            i = len(self.entries)
+            if not self.complete:
+                # Older than everything held, and older posts are not held
+                return
+        self.entries.insert(i, _Entry(post))
+        if len(self.entries) > HOT_FEED_SIZE:
+            self.entries.pop()
+            self.complete = False
+
+    def update(self, changed: dict):
+        for i, entry in enumerate(self.entries):
+            if entry.post["_id"] == changed["_id"]:
+                post = dict(entry.post)
+                for name, value in changed.items():
+                    # Counts only grow, so an older update arriving late is ignored
+                    post[name] = max(post.get(name, 0), value) if name == "comments_count" else value
+                self.entries[i] = _Entry(post)
+                return
+
+    def page(self, skip: int, limit: int, cursor: Optional[str]) -> Optional[list]:
+        if cursor:
+            try:
+                bound = decode_cursor(cursor)
+            except ValueError:
+                return None  # the database path answers 400
+            skip = next((i for i, entry in enumerate(self.entries) if _sort_key(entry.post) < bound), len(self.entries))
+        if skip + limit > len(self.entries) and not self.complete:
+            return None
+        return self.entries[skip:skip + limit]
+
+
+class HotPage(NamedTuple):
+    entries: list
+    version: int
+
+    @property
+    def posts(self) -> list:
+        return [entry.post for entry in self.entries]
+
+
+class HotFeed:
+    def __init__(self):
+        self._buffers = {}
+        # Feed version the buffers reflect, and the newest version seen anywhere
+        self.version = None
+        self.latest_version = 0
+        self.checked_at = 0.0
+        self.synced_at = 0.0
+        self._lock = None
+        self._wake = None
+        self._task = None
+
+    @property
+    def current(self) -> bool:
+        return (
+            self.version is not None
+            and self.version == self.latest_version
+            and time.monotonic() - self.checked_at <= 2 * HOT_FEED_CHECK_SECONDS
+        )
+
+    def page(self, post_type: Optional[str], skip: int, limit: int, cursor: Optional[str]) -> Optional[HotPage]:
+        """A feed page from memory, or None if the database has to answer"""
+        entries = None
+        if self.current:
+            entries = self._buffers[_listing(post_type)].page(skip, limit, cursor)
+        hot_feed_requests.inc("served" if entries is not None else "fallback")
+        return HotPage(entries, self.version) if entries is not None else None
+
+    def feed_changed(self, version: int, changed: Optional[dict]):
+        """Listener for models.database.bump_feed_version"""
+        self.latest_version = max(self.latest_version, version)
+        if self.version is None or version != self.version + 1 or changed is None:
+            # Another worker changed the feed in between, or the change is not
+            # described; reload instead
+            self._reload_soon()
+            return
+        if "created_at" in changed:
+            self._buffers[None].insert(changed)
+            self._buffers[_listing(changed["post_type"])].insert(changed)
+        else:
+            for buffer in self._buffers.values():
+                buffer.update(changed)
+        self.version = version
+
+    def _reload_soon(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    async def resync(self, reason: str = "startup"):
+        # Read the version before the posts, so a concurrent write can only
+        # leave the buffers behind (and due for another reload), never ahead
+        version = await get_feed_version()
+        buffers = {}
+        for listing in LISTINGS:
+            posts = await get_posts(limit=HOT_FEED_SIZE, post_type=listing)
+            buffers[listing] = _Buffer(posts, complete=len(posts) < HOT_FEED_SIZE)
+        self._buffers = buffers
+        self.version = version
+        self.latest_version = max(self.latest_version, version)
+        self.checked_at = self.synced_at = time.monotonic()
+        hot_feed_resyncs.inc(reason)
+
+    async def check(self):
+        """Reload if the database version moved past the buffers, or they are due"""
+        async with self._lock:
+            if self.version is None:
+                await self.resync("startup")
+                return
+            self.latest_version = max(self.latest_version, await get_feed_version())
+            self.checked_at = time.monotonic()
+            if self.version != self.latest_version:
+                await self.resync("behind")
+            elif self.checked_at - self.synced_at >= HOT_FEED_RESYNC_SECONDS:
+                await self.resync("periodic")
+
+    def start(self):
+        # Created here so they belong to the running event loop
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Reloaded from scratch if started again
+        self.version = None
+        self._buffers = {}
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), HOT_FEED_CHECK_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.check()
+            except Exception as e:
+                # Not current any more, so requests use the database meanwhile
+                print(f"⚠️ Warning: hot feed check failed: {e}")
+
+
+hot_feed = HotFeed()
+feed_change_listeners.append(hot_feed.feed_changed)
+
+
+@warmup_hook
+async def load_hot_feed():
+    """Fill the feed head before the first request"""
+    if hot_feed._task is not None:
+        await hot_feed.check()
+
+
+def start_hot_feed():
+    if HOT_FEED_ENABLED:
+        hot_feed.start()
+
+
+async def stop_hot_feed():
+    await hot_feed.stop()
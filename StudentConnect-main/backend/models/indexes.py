@@ -0,0 +1,256 @@
+"""
+Index bootstrap for the users, posts, comments and search collections.
+
+Every query shape issued by models/database.py has a matching index declared
+below. `ensure_indexes()` runs from the FastAPI lifespan in main.py and
+`check_indexes()` explains each helper's query and reports any COLLSCAN.
+
+Usage (from the backend directory):
+    python -m models.indexes          # create missing indexes, drop superseded ones
+    python -m models.indexes --check  # fail if any helper still scans or an old index remains
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from models.database import (
+    database,
+    users_collection,
+    posts_collection,
+    comments_collection
+)
+from models.search import POSTINGS_SORT, search_postings_collection
+from utils.outbox import email_outbox_collection
+from utils.rate_limit import rate_limits_collection
+from utils.pagination import FEED_SORT, THREAD_SORT, after_cursor, encode_cursor
+
+INDEXES = [
+    (users_collection, [
+        # get_user_by_email, store_reset_token, clear_reset_token
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # get_user_by_username
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        # validate_reset_token - only users with a pending reset carry a token
+        IndexModel([("reset_token", ASCENDING)], name="reset_token_sparse", sparse=True),
+    ]),
+    (posts_collection, [
+        # get_posts without filters; _id backs the keyset cursor tie-break
+        IndexModel(
+            [("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="created_at_id_desc"
+        ),
+        # get_posts filtered by post_type
+        IndexModel(
+            [("post_type", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="post_type_created_at_id"
+        ),
+        # get_user_posts
+        IndexModel(
+            [("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="author_id_created_at_id"
+        ),
+    ]),
+    (comments_collection, [
+        # get_comments_by_post_id
+        IndexModel(
+            [("post_id", ASCENDING), ("created_at", ASCENDING)],
+            name="post_id_created_at"
+        ),
+        # get_child_comments, get_first_replies, get_parents_with_replies
+        IndexModel(
+            [("post_id", ASCENDING), ("parent_comment_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="post_id_parent_created_at_id"
+        ),
+    ]),
+    (search_postings_collection, [
+        # rank_posts postings lookup, highest term frequency first (POSTINGS_SORT)
+        IndexModel(
+            [("term", ASCENDING), ("tf", DESCENDING), ("created_at", DESCENDING)],
+            name="term_tf_created_at"
+        ),
+        # rank_posts combined with a post_type filter
+        IndexModel(
+            [("term", ASCENDING), ("post_type", ASCENDING), ("tf", DESCENDING), ("created_at", DESCENDING)],
+            name="term_post_type_tf_created_at"
+        ),
+        # reindex_posts
+        IndexModel([("post_id", ASCENDING)], name="post_id"),
+    ]),
+    (email_outbox_collection, [
+        # OutboxSender._claim_batch: due pending messages
+        IndexModel(
+            [("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+            name="status_next_attempt_at"
+        ),
+        # OutboxSender._claim_batch: expired leases
+        IndexModel(
+            [("status", ASCENDING), ("locked_until", ASCENDING)],
+            name="status_locked_until"
+        ),
+        # Sent and failed messages are removed by MongoDB at expires_at
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]),
+    (rate_limits_collection, [
+        # Shared rate limit buckets (RATE_LIMIT_STORE=mongo) expire once refilled
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ]),
+]
+
+# Indexes earlier versions created that a declared index now replaces:
+# name -> (collection, name of the replacement). Each is dropped once its
+# replacement exists, so deploys stop paying write cost for it.
+SUPERSEDED_INDEXES = {
+    "created_at_desc": (posts_collection, "created_at_id_desc"),
+    "post_type_created_at": (posts_collection, "post_type_created_at_id"),
+    "author_id_created_at": (posts_collection, "author_id_created_at_id"),
+    "term_created_at": (search_postings_collection, "term_tf_created_at"),
+    "term_post_type_created_at": (search_postings_collection, "term_post_type_tf_created_at"),
+    "sent_at_ttl": (email_outbox_collection, "expires_at_ttl"),
+}
+
+CHECK_CURSOR = encode_cursor({"created_at": datetime(2024, 1, 1), "_id": ObjectId()})
+
+# (helper, collection, filter, sort) for every query shape in database.py and search.py.
+# search_terms prefix expansion is an anchored regex on _id and always uses its index.
+QUERY_SHAPES = [
+    ("get_user_by_email", users_collection, {"email": "check@example.com"}, None),
+    ("get_user_by_username", users_collection, {"username": "check"}, None),
+    ("validate_reset_token", users_collection, {"reset_token": "check"}, None),
+    ("get_posts", posts_collection, {}, FEED_SORT),
+    ("get_posts(post_type)", posts_collection, {"post_type": "notes"}, FEED_SORT),
+    ("get_posts(cursor)", posts_collection, after_cursor(CHECK_CURSOR), FEED_SORT),
+    ("get_user_posts", posts_collection, {"author_id": "check"}, FEED_SORT),
+    ("get_comments_by_post_id", comments_collection, {"post_id": "check"}, [("created_at", ASCENDING)]),
+    ("get_child_comments", comments_collection, {"post_id": "check", "parent_comment_id": None}, THREAD_SORT),
+    ("get_child_comments(cursor)", comments_collection, {"post_id": "check", "parent_comment_id": "check", **after_cursor(CHECK_CURSOR, descending=False)}, THREAD_SORT),
+    ("rank_posts", search_postings_collection, {"term": "check"}, POSTINGS_SORT),
+    ("rank_posts(post_type)", search_postings_collection, {"term": "check", "post_type": "notes"}, POSTINGS_SORT),
+    ("reindex_posts", search_postings_collection, {"post_id": ObjectId()}, None),
+]
+
+PROGRESS_INTERVAL_SECONDS = 2
+
+
+async def _report_build_progress():
+    """Print progress of in-flight index builds until cancelled"""
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL_SECONDS)
+        try:
+            result = await database.client.admin.command(
+                "currentOp", {"command.createIndexes": {"$exists": True}}
+            )
+        except OperationFailure:
+            # Shared Atlas tiers do not allow currentOp; builds still finish
+            return
+        for op in result.get("inprog", []):
+            progress = op.get("progress") or {}
+            if progress.get("total"):
+                print(
+                    f"⏳ Building indexes on {op.get('ns')}: "
+                    f"{progress.get('done', 0)}/{progress['total']}"
+                )
+
+
+async def ensure_indexes() -> bool:
+    """Create any missing indexes; returns False if one could not be built"""
+    print("=== INDEX BOOTSTRAP ===")
+    ok = True
+    reporter = asyncio.create_task(_report_build_progress())
+    try:
+        for collection, models in INDEXES:
+            existing = await collection.index_information()
+            missing = [model for model in models if model.document["name"] not in existing]
+            if not missing:
+                print(f"✅ {collection.name}: {len(models)} indexes present")
+                continue
+
+            for model in missing:
+                name = model.document["name"]
+                started = time.perf_counter()
+                try:
+                    await collection.create_indexes([model])
+                    print(f"✅ {collection.name}.{name} built in {time.perf_counter() - started:.2f}s")
+                except OperationFailure as e:
+                    # e.g. duplicate emails blocking a unique index
+                    ok = False
+                    print(f"❌ {collection.name}.{name} failed: {e}")
+    finally:
+        reporter.cancel()
+    if not await drop_superseded_indexes():
+        ok = False
+    print("=== END INDEX BOOTSTRAP ===")
+    return ok
+
+
+async def superseded_indexes() -> list:
+    """(collection, old name, replacement, replacement built) for superseded indexes still present"""
+    found = []
+    existing = {}
+    for name, (collection, replacement) in SUPERSEDED_INDEXES.items():
+        if collection.name not in existing:
+            existing[collection.name] = await collection.index_information()
+        if name in existing[collection.name]:
+            found.append((collection, name, replacement, replacement in existing[collection.name]))
+    return found
+
+
+async def drop_superseded_indexes() -> bool:
+    """Drop old indexes whose replacement is built; returns False if a drop failed"""
+    ok = True
+    for collection, name, replacement, replaced in await superseded_indexes():
+        if not replaced:
+            # Keep serving queries from the old index until the new one exists
+            print(f"⚠️ Warning: keeping {collection.name}.{name} until {replacement} is built")
+            continue
+        try:
+            await collection.drop_index(name)
+            print(f"✅ {collection.name}.{name} dropped, superseded by {replacement}")
+        except OperationFailure as e:
+            ok = False
+            print(f"❌ {collection.name}.{name} could not be dropped: {e}")
+    return ok
+
+
+def plan_stages(plan: dict):
+    """Yield every stage name in a winning plan tree"""
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+async def check_indexes() -> bool:
+    """Explain every helper's query shape; returns False if any does a COLLSCAN
+    or a superseded index is still present"""
+    ok = True
+    for helper, collection, query, sort in QUERY_SHAPES:
+        cursor = collection.find(query).limit(20)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = await cursor.explain()
+        stages = list(plan_stages(plan["queryPlanner"]["winningPlan"]))
+        if "COLLSCAN" in stages:
+            ok = False
+            print(f"❌ {helper}: COLLSCAN on {collection.name}")
+        else:
+            print(f"✅ {helper}: {' <- '.join(stages)}")
+    for collection, name, replacement, _ in await superseded_indexes():
+        ok = False
+        print(f"❌ {collection.name}.{name} is superseded by {replacement}; run python -m models.indexes to drop it")
+    return ok
+
+
+async def _main(argv):
+    if "--check" in argv:
+        return 0 if await check_indexes() else 1
+    return 0 if await ensure_indexes() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
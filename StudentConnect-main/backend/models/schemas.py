@@ -85,6 +85,25 @@ class PostResponse(PostBase):
     created_at: datetime
     updated_at: datetime
 
+class PostSummaryResponse(BaseModel):
+    """Feed card view of a post: an excerpt instead of the full content"""
+    id: str
+    title: str
+    excerpt: str
+    post_type: PostType
+    tags: Optional[List[str]] = []
+    author_id: str
+    author_name: str
+    author_username: str
+    author_profile_picture: Optional[str] = None
+    document_url: Optional[str] = None
+    document_name: Optional[str] = None
+    job_link: Optional[str] = None
+    company: Optional[str] = None
+    location: Optional[str] = None
+    comments_count: int = 0
+    created_at: datetime
+
 # Comment Models
 class CommentBase(BaseModel):
     content: str
@@ -104,6 +123,18 @@ class CommentResponse(CommentBase):
     created_at: datetime
     updated_at: datetime
 
+class ThreadedCommentResponse(CommentResponse):
+    depth: int = 0
+    replies: List["ThreadedCommentResponse"] = []
+    # More direct replies exist than were included; fetch them from
+    # /comments/{post_id}/replies/{id}, passing replies_cursor when set
+    has_more_replies: bool = False
+    replies_cursor: Optional[str] = None
+
+class CommentThreadPage(BaseModel):
+    comments: List[ThreadedCommentResponse]
+    next_cursor: Optional[str] = None
+
 # Token Model
 class Token(BaseModel):
     access_token: str
@@ -0,0 +1,280 @@
+"""
+Full-text search over posts.
+
+Posts are tokenized into an inverted index kept in MongoDB:
+    search_postings  one document per (term, post) with its weighted term frequency
+    search_terms     document frequency per term, keyed by the term itself
+    search_stats     corpus size and total length for BM25 length normalization
+
+`index_post()` updates the index incrementally when a post is created,
+`reindex_author_posts()` when an author's name or username changes, and
+`search_posts()` ranks matches with BM25. Query tokens of
+MIN_PREFIX_CHARS or more also match as a prefix, so "mach" finds "machine".
+
+The work per query is bounded, not proportional to corpus size:
+- each token expands to at most MAX_PREFIX_EXPANSIONS other terms, the
+  ones in the most posts (highest df) first;
+- each exact term reads at most MAX_POSTINGS_PER_TERM postings and each
+  prefix expansion at most MAX_POSTINGS_PER_PREFIX_TERM;
+- postings are read highest term frequency first (a title hit before a tag
+  or author hit), then newest first. That is the order in which their BM25
+  contribution falls.
+
+Recall tradeoff: a term in more posts than its postings cap is only looked
+up in the capped postings with the highest weight. A post that mentions a very
+common term only in a low-weight field (for example once in a tag) can
+therefore be missing from the results for that term. Ties fall to the
+newest posts. Rare terms, which carry most of the ranking weight, are
+always read in full.
+
+Rebuild the index for existing posts (from the backend directory):
+    python -m models.search --rebuild
+"""
+import asyncio
+import math
+import re
+import sys
+import unicodedata
+from typing import Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from models.database import database, posts_collection
+from utils.authors import AuthorLoader
+
+search_postings_collection = database.get_collection("search_postings")
+search_terms_collection = database.get_collection("search_terms")
+search_stats_collection = database.get_collection("search_stats")
+
+# Field weights: a title hit counts three times as much as an author hit
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "author_name": 1.0,
+    "author_username": 1.0,
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAX_QUERY_TERMS = 6
+MIN_PREFIX_CHARS = 3
+MAX_PREFIX_EXPANSIONS = 3
+MAX_POSTINGS_PER_TERM = 1000
+MAX_POSTINGS_PER_PREFIX_TERM = 200
+PREFIX_MATCH_WEIGHT = 0.5
+# Postings order: highest weighted term frequency first, newest among equals
+POSTINGS_SORT = [("tf", -1), ("created_at", -1)]
+MAX_TOKEN_LENGTH = 40
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> list:
+    """Lowercase, strip accents and split on anything that is not a letter or digit"""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(ch for ch in folded if not unicodedata.combining(ch))
+    return [token[:MAX_TOKEN_LENGTH] for token in _TOKEN_RE.findall(folded)]
+
+
+def post_terms(post: dict) -> dict:
+    """Map each term in a post's searchable fields to its weighted frequency"""
+    terms = {}
+    for field, weight in FIELD_WEIGHTS.items():
+        value = post.get(field) or ""
+        if isinstance(value, list):
+            value = " ".join(value)
+        for token in tokenize(value):
+            terms[token] = terms.get(token, 0.0) + weight
+    return terms
+
+
+async def index_posts(posts: list):
+    """Add posts to the inverted index in one batch of writes"""
+    postings = []
+    df_increments = {}
+    total_length = 0.0
+    for post in posts:
+        terms = post_terms(post)
+        length = sum(terms.values())
+        total_length += length
+        for term, tf in terms.items():
+            postings.append({
+                "term": term,
+                "post_id": post["_id"],
+                "post_type": post["post_type"],
+                "created_at": post["created_at"],
+                "tf": tf,
+                "dl": length,
+            })
+            df_increments[term] = df_increments.get(term, 0) + 1
+
+    if postings:
+        await search_postings_collection.insert_many(postings, ordered=False)
+        await search_terms_collection.bulk_write([
+            UpdateOne({"_id": term}, {"$inc": {"df": count}}, upsert=True)
+            for term, count in df_increments.items()
+        ], ordered=False)
+    await search_stats_collection.update_one(
+        {"_id": "posts"},
+        {"$inc": {"doc_count": len(posts), "total_length": total_length}},
+        upsert=True
+    )
+
+
+async def index_post(post: dict):
+    """Add a newly created post to the inverted index"""
+    await index_posts([post])
+
+
+async def reindex_posts(posts: list):
+    """Replace the postings of already indexed posts, e.g. after their author was renamed"""
+    post_ids = [post["_id"] for post in posts]
+    old = await search_postings_collection.find(
+        {"post_id": {"$in": post_ids}}, {"_id": 0, "term": 1, "post_id": 1, "dl": 1}
+    ).to_list(length=None)
+    df_decrements = {}
+    lengths = {}
+    for posting in old:
+        df_decrements[posting["term"]] = df_decrements.get(posting["term"], 0) + 1
+        lengths[posting["post_id"]] = posting["dl"]
+
+    await search_postings_collection.delete_many({"post_id": {"$in": post_ids}})
+    if df_decrements:
+        await search_terms_collection.bulk_write([
+            UpdateOne({"_id": term}, {"$inc": {"df": -count}})
+            for term, count in df_decrements.items()
+        ], ordered=False)
+    # index_posts counts the posts and their new lengths back in
+    await search_stats_collection.update_one(
+        {"_id": "posts"},
+        {"$inc": {"doc_count": -len(posts), "total_length": -sum(lengths.values())}}
+    )
+    await index_posts(posts)
+
+
+async def reindex_author_posts(author_id: str, batch_size: int = 200):
+    """Reindex every post by an author whose name or username changed"""
+    last_id = None
+    while True:
+        query = {"author_id": author_id}
+        if last_id is not None:
+            query["_id"] = {"$lt": last_id}
+        batch = await posts_collection.find(query).sort("_id", -1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return
+        # The caller invalidated the author's cache entry, so these are the new fields
+        await reindex_posts(await AuthorLoader().hydrate(batch))
+        last_id = batch[-1]["_id"]
+
+
+async def _expand_token(token: str) -> list:
+    """Other indexed terms starting with `token`, in the most posts first"""
+    if len(token) < MIN_PREFIX_CHARS:
+        return []
+    # The anchored regex is a range scan on _id; the df sort keeps only the top few in memory
+    cursor = search_terms_collection.find(
+        {"_id": {"$regex": f"^{re.escape(token)}", "$ne": token}, "df": {"$gt": 0}}
+    ).sort("df", -1).limit(MAX_PREFIX_EXPANSIONS)
+    return await cursor.to_list(length=MAX_PREFIX_EXPANSIONS)
+
+
+async def _expand_terms(tokens: list) -> dict:
+    """Resolve query tokens to indexed terms; returns {term: (df, match_weight)}"""
+    exact, *prefixes = await asyncio.gather(
+        search_terms_collection.find({"_id": {"$in": tokens}, "df": {"$gt": 0}}).to_list(length=len(tokens)),
+        *(_expand_token(token) for token in tokens)
+    )
+    expanded = {doc["_id"]: (doc["df"], 1.0) for doc in exact}
+    for docs in prefixes:
+        for doc in docs:
+            expanded.setdefault(doc["_id"], (doc["df"], PREFIX_MATCH_WEIGHT))
+    return expanded
+
+
+async def _postings(term: str, post_type: Optional[str], limit: int):
+    query = {"term": term}
+    if post_type:
+        query["post_type"] = post_type
+    cursor = search_postings_collection.find(
+        query, {"_id": 0, "post_id": 1, "tf": 1, "dl": 1, "created_at": 1}
+    ).sort(POSTINGS_SORT).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def rank_posts(search: str, post_type: Optional[str] = None) -> list:
+    """Return post ids matching `search`, best BM25 score first"""
+    tokens = list(dict.fromkeys(tokenize(search)))[:MAX_QUERY_TERMS]
+    if not tokens:
+        return []
+
+    expanded, stats = await asyncio.gather(
+        _expand_terms(tokens),
+        search_stats_collection.find_one({"_id": "posts"})
+    )
+    if not expanded or not stats:
+        return []
+
+    doc_count = max(stats["doc_count"], 1)
+    avg_length = stats["total_length"] / doc_count or 1.0
+    terms = list(expanded)
+    postings = await asyncio.gather(*(
+        _postings(term, post_type, MAX_POSTINGS_PER_TERM if expanded[term][1] == 1.0 else MAX_POSTINGS_PER_PREFIX_TERM)
+        for term in terms
+    ))
+
+    scores = {}
+    newest = {}
+    for term, term_postings in zip(terms, postings):
+        df, match_weight = expanded[term]
+        idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+        for posting in term_postings:
+            tf = posting["tf"]
+            norm = tf + K1 * (1 - B + B * posting["dl"] / avg_length)
+            post_id = posting["post_id"]
+            scores[post_id] = scores.get(post_id, 0.0) + match_weight * idf * tf * (K1 + 1) / norm
+            newest[post_id] = posting["created_at"]
+
+    return sorted(scores, key=lambda post_id: (scores[post_id], newest[post_id]), reverse=True)
+
+
+async def search_posts(search: str, skip: int = 0, limit: int = 20, post_type: Optional[str] = None, projection: Optional[dict] = None) -> list:
+    """Return one page of posts ranked by relevance to `search`"""
+    ranked = await rank_posts(search, post_type=post_type)
+    page_ids = ranked[skip:skip + limit]
+    if not page_ids:
+        return []
+
+    posts = await posts_collection.find({"_id": {"$in": page_ids}}, projection).to_list(length=limit)
+    by_id = {post["_id"]: post for post in posts}
+    return [by_id[post_id] for post_id in page_ids if post_id in by_id]
+
+
+async def rebuild_search_index(batch_size: int = 500):
+    """Drop and rebuild the inverted index from every existing post"""
+    await search_postings_collection.delete_many({})
+    await search_terms_collection.delete_many({})
+    await search_stats_collection.delete_many({})
+
+    indexed = 0
+    last_id = ObjectId("0" * 24)
+    while True:
+        batch = await posts_collection.find({"_id": {"$gt": last_id}}).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        # Posts may store only author_id; index the author's current name
+        await index_posts(await AuthorLoader().hydrate(batch))
+        indexed += len(batch)
+        last_id = batch[-1]["_id"]
+        print(f"⏳ Indexed {indexed} posts...")
+
+    print(f"🎉 Search index rebuilt for {indexed} posts")
+
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv[1:]:
+        asyncio.run(rebuild_search_index())
+    else:
+        print("Usage: python -m models.search --rebuild")
@@ -0,0 +1,73 @@
+"""
+Document-to-wire mappers for API responses.
+
+Each mapper picks the fields of the matching response model
+(PostResponse, CommentResponse, UserResponse) out of a MongoDB document and
+validates them against that model once. A document with a missing or
+wrong-typed field (non-list tags, a string created_at, ...) raises instead
+of reaching the client in a shape the docs do not describe. The result is
+the model's validated fields as a plain dict. Routes return it in an
+ORJSONResponse, which FastAPI sends as-is instead of validating and
+serializing it a second time through response_model. The response_model
+declarations stay in place for the OpenAPI docs.
+"""
+from typing import Optional
+from models.schemas import CommentResponse, PostResponse, UserResponse
+
+
+def _validated(model, wire: dict) -> dict:
+    """One validation pass of `wire` against `model`; its fields as a plain dict"""
+    return vars(model.model_validate(wire))
+
+
+def post_to_wire(post: dict) -> dict:
+    """PostResponse-shaped dict"""
+    return _validated(PostResponse, {
+        "id": str(post["_id"]),
+        "title": post["title"],
+        "content": post["content"],
+        "post_type": post["post_type"],
+        "tags": post.get("tags") or [],
+        "author_id": post["author_id"],
+        "author_name": post["author_name"],
+        "author_username": post["author_username"],
+        "author_profile_picture": post.get("author_profile_picture", ""),
+        "document_url": post.get("document_url"),
+        "document_name": post.get("document_name"),
+        "job_link": post.get("job_link"),
+        "company": post.get("company"),
+        "location": post.get("location"),
+        "comments_count": post.get("comments_count", 0),
+        "created_at": post["created_at"],
+        "updated_at": post["updated_at"]
+    })
+
+
+def comment_to_wire(comment: dict, replies: Optional[list] = None) -> dict:
+    """CommentResponse-shaped dict; `replies` is filled in by the caller"""
+    return _validated(CommentResponse, {
+        "id": str(comment["_id"]),
+        "content": comment["content"],
+        "post_id": comment["post_id"],
+        "parent_comment_id": comment.get("parent_comment_id"),
+        "author_id": comment["author_id"],
+        "author_name": comment["author_name"],
+        "author_username": comment["author_username"],
+        "author_profile_picture": comment.get("author_profile_picture", ""),
+        "replies": replies if replies is not None else [],
+        "created_at": comment["created_at"],
+        "updated_at": comment["updated_at"]
+    })
+
+
+def user_to_wire(user: dict) -> dict:
+    """UserResponse-shaped dict; never includes the password hash or reset token"""
+    return _validated(UserResponse, {
+        "id": str(user["_id"]),
+        "email": user["email"],
+        "username": user["username"],
+        "name": user["name"],
+        "bio": user.get("bio", ""),
+        "profile_picture": user.get("profile_picture", ""),
+        "created_at": user["created_at"]
+    })
@@ -1,53 +1,76 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from datetime import datetime, timedelta
 from models.schemas import UserCreate, UserLogin, UserResponse, Token, UserUpdate, ForgotPasswordRequest, ResetPasswordRequest
 from models.database import (
     get_user_by_email, 
     get_user_by_username, 
+    find_user_conflict,
     create_user, 
     update_user,
     get_user_by_id,
     users_collection,
-    posts_collection
+    posts_collection,
+    bump_feed_version,
+    bump_version,
+    AUTHORS_VERSION_ID
 )
+from models.search import reindex_author_posts
+from models.serializers import user_to_wire
 from utils.auth import (
-    verify_password, 
-    get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
     create_access_token, 
     get_current_user,
+    user_changed,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from utils.authors import AUTHOR_HYDRATION, invalidate_author
 from utils.email import (
     generate_reset_token,
     store_reset_token,
     validate_reset_token,
-    clear_reset_token,
     send_reset_email
 )
-from utils.cloudinary import upload_file_to_cloudinary, delete_file_from_cloudinary
+from utils.rate_limit import (
+    FORGOT_PASSWORD_PER_ACCOUNT,
+    FORGOT_PASSWORD_PER_IP,
+    LOGIN_FAILURES_PER_ACCOUNT,
+    LOGIN_PER_IP,
+    client_ip,
+    enforce_rate_limit,
+    refund_rate_limit
+)
+from utils.storage import MAX_PROFILE_PICTURE_BYTES, UploadTooLarge, check_upload_size, get_storage, save_upload
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+async def author_changed(user: dict, changed_fields: set):
+    """A user's name, username or picture changed: drop their cached author
+    fields, move the versions that feed and comment ETags are built from and,
+    for a new name or username, reindex their posts for search"""
+    await bump_feed_version()
+    invalidate_author(str(user["_id"]), await bump_version(AUTHORS_VERSION_ID))
+    if changed_fields & {"name", "username"}:
+        try:
+            await reindex_author_posts(str(user["_id"]))
+        except Exception as e:
+            # Search keeps matching the old name until the next --rebuild
+            print(f"⚠️ Warning: Could not reindex posts for user @{user['username']}: {e}")
+
 @router.post("/signup", response_model=UserResponse)
 async def signup(user: UserCreate):
-    # Check if user already exists
-    existing_user = await get_user_by_email(user.email)
+    # Check email and username availability in one query
+    existing_user = await find_user_conflict(user.email, user.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    existing_username = await get_user_by_username(user.username)
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
+            detail="Email already registered" if existing_user["email"] == user.email else "Username already taken"
         )
     
     # Hash password and create user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     user_data = {
         "email": user.email,
         "username": user.username,
@@ -60,26 +83,36 @@ async def signup(user: UserCreate):
     }
     
     created_user = await create_user(user_data)
-    return UserResponse(
-        id=str(created_user["_id"]),
-        email=created_user["email"],
-        username=created_user["username"],
-        name=created_user["name"],
-        bio=created_user["bio"],
-        profile_picture=created_user["profile_picture"],
-        created_at=created_user["created_at"]
-    )
+    return ORJSONResponse(user_to_wire(created_user))
 
 @router.post("/login", response_model=Token)
-async def login(user: UserLogin):
+async def login(user: UserLogin, request: Request):
+    # Rejected before any lookup or hashing, so a burst cannot pin the CPU
+    account = user.email.lower()
+    await enforce_rate_limit(LOGIN_PER_IP, client_ip(request))
+    # Taken before bcrypt runs so concurrent guesses count against the
+    # account too; refunded below if the password is right
+    await enforce_rate_limit(LOGIN_FAILURES_PER_ACCOUNT, account)
+    
     db_user = await get_user_by_email(user.email)
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    is_valid, new_hash = (False, None)
+    if db_user:
+        is_valid, new_hash = await verify_password_async(user.password, db_user["hashed_password"])
+    if not is_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Stored hash uses an outdated scheme or cost factor; upgrade it now
+    if new_hash:
+        await users_collection.update_one(
+            {"_id": db_user["_id"]},
+            {"$set": {"hashed_password": new_hash}}
+        )
+    
+    await refund_rate_limit(LOGIN_FAILURES_PER_ACCOUNT, account)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": db_user["email"]}, expires_delta=access_token_expires
@@ -88,15 +121,7 @@ async def login(user: UserLogin):
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user = Depends(get_current_user)):
-    return UserResponse(
-        id=str(current_user["_id"]),
-        email=current_user["email"],
-        username=current_user["username"],
-        name=current_user["name"],
-        bio=current_user["bio"],
-        profile_picture=current_user["profile_picture"],
-        created_at=current_user["created_at"]
-    )
+    return ORJSONResponse(user_to_wire(current_user))
 
 @router.put("/profile", response_model=UserResponse)
 async def update_profile(
@@ -116,15 +141,14 @@ async def update_profile(
     update_data["updated_at"] = datetime.utcnow()
     
     updated_user = await update_user(str(current_user["_id"]), update_data)
-    return UserResponse(
-        id=str(updated_user["_id"]),
-        email=updated_user["email"],
-        username=updated_user["username"],
-        name=updated_user["name"],
-        bio=updated_user["bio"],
-        profile_picture=updated_user["profile_picture"],
-        created_at=updated_user["created_at"]
-    )
+    await user_changed(current_user["email"])
+    changed_fields = {
+        name for name in ("name", "username", "profile_picture")
+        if name in update_data and update_data[name] != current_user.get(name)
+    }
+    if AUTHOR_HYDRATION and changed_fields:
+        await author_changed(current_user, changed_fields)
+    return ORJSONResponse(user_to_wire(updated_user))
 
 @router.get("/user/{username}", response_model=UserResponse)
 async def get_user_profile(username: str):
@@ -135,21 +159,15 @@ async def get_user_profile(username: str):
             detail="User not found"
         )
     
-    return UserResponse(
-        id=str(user["_id"]),
-        email=user["email"],
-        username=user["username"],
-        name=user["name"],
-        bio=user["bio"],
-        profile_picture=user["profile_picture"],
-        created_at=user["created_at"]
-    )
+    return ORJSONResponse(user_to_wire(user))
 
 @router.post("/forgot-password")
-async def forgot_password(request: ForgotPasswordRequest):
+async def forgot_password(request: ForgotPasswordRequest, http_request: Request):
     """
     Send password reset email with secure token using Web3Forms
     """
+    await enforce_rate_limit(FORGOT_PASSWORD_PER_IP, client_ip(http_request))
+    await enforce_rate_limit(FORGOT_PASSWORD_PER_ACCOUNT, request.email.lower())
     user = await get_user_by_email(request.email)
     if not user:
         return {"message": "If the email exists, a password reset link has been sent"}
@@ -161,7 +179,7 @@ async def forgot_password(request: ForgotPasswordRequest):
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to process password reset request"
             )
-        email_sent = send_reset_email(request.email, reset_token)
+        email_sent = await send_reset_email(request.email, reset_token)
         if not email_sent:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -192,15 +210,19 @@ async def reset_password(request: ResetPasswordRequest):
     
     try:
         # Hash the new password
-        hashed_password = get_password_hash(request.new_password)
+        hashed_password = await get_password_hash_async(request.new_password)
         
-        # Update user's password
+        # Update user's password and clear the reset token in one write
         result = await users_collection.update_one(
             {"_id": user["_id"]},
             {
                 "$set": {
                     "hashed_password": hashed_password,
                     "updated_at": datetime.utcnow()
+                },
+                "$unset": {
+                    "reset_token": "",
+                    "reset_token_expires": ""
                 }
             }
         )
@@ -211,8 +233,7 @@ async def reset_password(request: ResetPasswordRequest):
                 detail="Failed to update password"
             )
         
-        # Clear the reset token
-        await clear_reset_token(user["email"])
+        await user_changed(user["email"])
         
         return {"message": "Password has been reset successfully"}
         
@@ -239,34 +260,28 @@ async def update_profile_picture(
             detail="File must be an image"
         )
     
-    # Validate file size (max 5MB)
-    file_size = 0
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    if file_size > 5 * 1024 * 1024:  # 5MB
+    # Validate file size (max 5MB) without reading it into memory
+    try:
+        await check_upload_size(file, MAX_PROFILE_PICTURE_BYTES)
+    except UploadTooLarge as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size must be less than 5MB"
+            detail=str(e)
         )
     
     try:
         # Delete old profile picture if it exists
         if current_user.get("profile_picture"):
-            old_url = current_user["profile_picture"]
-            # Extract public_id from Cloudinary URL
-            if "cloudinary.com" in old_url:
-                # Extract public_id from URL (this is a simplified extraction)
-                public_id = old_url.split("/")[-1].split(".")[0]
-                try:
-                    await delete_file_from_cloudinary(f"profile_pictures/{public_id}")
-                except:
-                    pass  # Ignore errors when deleting old image
+            try:
+                await get_storage().delete_url(current_user["profile_picture"], folder="profile_pictures")
+            except:
+                pass  # Ignore errors when deleting old image
         
         # Upload new profile picture
-        upload_result = await upload_file_to_cloudinary(
-            file_content, 
-            folder="profile_pictures"
+        upload_result = await save_upload(
+            file,
+            folder="profile_pictures",
+            max_bytes=MAX_PROFILE_PICTURE_BYTES
         )
         
         # Update user in database
@@ -276,6 +291,12 @@ async def update_profile_picture(
         }
         
         updated_user = await update_user(str(current_user["_id"]), update_data)
+        await user_changed(current_user["email"])
+        
+        if AUTHOR_HYDRATION:
+            # Posts and comments resolve their author at read time
+            await author_changed(current_user, {"profile_picture"})
+            return ORJSONResponse(user_to_wire(updated_user))
         
         # Update all existing posts by this user with the new profile picture
         try:
@@ -283,20 +304,13 @@ async def update_profile_picture(
                 {"author_username": current_user["username"]},
                 {"$set": {"author_profile_picture": upload_result["url"]}}
             )
+            await bump_feed_version()
             print(f"✅ Updated profile picture in all posts for user @{current_user['username']}")
         except Exception as e:
             print(f"⚠️ Warning: Could not update posts with new profile picture: {e}")
             # Don't fail the request if post updates fail
         
-        return UserResponse(
-            id=str(updated_user["_id"]),
-            email=updated_user["email"],
-            username=updated_user["username"],
-            name=updated_user["name"],
-            bio=updated_user["bio"],
-            profile_picture=updated_user["profile_picture"],
-            created_at=updated_user["created_at"]
-        )
+        return ORJSONResponse(user_to_wire(updated_user))
         
     except Exception as e:
         print(f"Error uploading profile picture: {e}")
@@ -1,106 +1,237 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header
+from fastapi.responses import ORJSONResponse
+from typing import List, Optional
 from datetime import datetime
-from models.schemas import CommentCreate, CommentResponse
+from models.schemas import CommentCreate, CommentResponse, CommentThreadPage
 from models.database import (
     create_comment,
-    get_comments_by_post_id,
+    get_comment_by_id,
+    get_child_comments,
+    get_first_replies,
+    get_parents_with_replies,
     get_post_by_id,
-    posts_collection
+    get_version,
+    AUTHORS_VERSION_ID
 )
+from models.serializers import comment_to_wire
 from utils.auth import get_current_user
-from bson import ObjectId
+from utils.authors import AUTHOR_HYDRATION, AuthorLoader, get_author_loader, stored_author_fields
+from utils.pagination import encode_cursor
+from utils.post_reads import invalidate_post, read_comments, read_post
+from utils.http_cache import COMMENTS_CACHE_CONTROL, cache_headers, etag_matches, not_modified, weak_etag
+from bson.errors import InvalidId
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
 
 @router.post("/", response_model=CommentResponse)
 async def create_new_comment(
     comment: CommentCreate,
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    authors: AuthorLoader = Depends(get_author_loader)
 ):
-    # Check if post exists
-    post = await get_post_by_id(comment.post_id)
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Post not found"
-        )
+    # Materialized ancestor path: root first, direct parent last
+    ancestors = []
+    if comment.parent_comment_id:
+        parent = await find_comment(comment.parent_comment_id)
+        if not parent or parent["post_id"] != comment.post_id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Parent comment not found"
+            )
+        ancestors = parent_ancestors(parent) + [comment.parent_comment_id]
     
     comment_data = {
         "content": comment.content,
         "post_id": comment.post_id,
         "parent_comment_id": comment.parent_comment_id,
-        "author_id": str(current_user["_id"]),
-        "author_name": current_user["name"],
-        "author_username": current_user["username"],
-        "author_profile_picture": current_user.get("profile_picture", ""),
+        "ancestors": ancestors,
+        "depth": len(ancestors),
+        **stored_author_fields(current_user),
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
     }
     
+    # Post existence is checked by the write itself
     created_comment = await create_comment(comment_data)
+    if created_comment is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found"
+        )
+    invalidate_post(comment.post_id)
+    
+    authors.prime(current_user)
+    await authors.hydrate([created_comment])
+    return ORJSONResponse(comment_to_wire(created_comment))
+
+def build_comment_tree(comments: list) -> list:
+    """Nest comments under their parents at any depth; returns the root comments"""
+    nodes = {str(comment["_id"]): comment_to_wire(comment) for comment in comments}
+    root_comments = []
+    for comment in comments:
+        node = nodes[str(comment["_id"])]
+        parent_id = comment.get("parent_comment_id")
+        if not parent_id:
+            root_comments.append(node)
+        elif parent_id in nodes:
+            nodes[parent_id]["replies"].append(node)
+    return root_comments
+
+async def find_comment(comment_id: str):
+    try:
+        return await get_comment_by_id(comment_id)
+    except InvalidId:
+        return None
+
+def parent_ancestors(comment: dict) -> list:
+    """Ancestor path of an existing comment, including ones stored before paths existed"""
+    if "ancestors" in comment:
+        return comment["ancestors"]
+    return [comment["parent_comment_id"]] if comment.get("parent_comment_id") else []
+
+def thread_node(comment: dict) -> dict:
+    """ThreadedCommentResponse-shaped dict with no replies attached yet"""
+    node = comment_to_wire(comment)
+    node["depth"] = comment.get("depth", len(parent_ancestors(comment)))
+    node["has_more_replies"] = False
+    node["replies_cursor"] = None
+    return node
+
+async def load_thread(
+    post_id: str,
+    parent_id: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    replies_per_comment: int,
+    depth: int,
+    authors: AuthorLoader
+) -> ORJSONResponse:
+    """Page through a comment's replies (roots when parent_id is None), each
+    with its first replies_per_comment replies down to `depth` more levels.
+    
+    Each level runs one limited query per comment on it (concurrently), and
+    reads at most replies_per_comment + 1 replies per comment, so memory use
+    grows with the page size, replies_per_comment and depth, not with how
+    many replies a comment has.
+    Authors for the whole page are resolved in one batch before building nodes.
+    """
+    try:
+        comments = await get_child_comments(post_id, parent_id, limit + 1, cursor=cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    next_cursor = encode_cursor(comments[limit - 1]) if len(comments) > limit else None
+    
+    top = comments[:limit]
+    loaded = list(top)
+    # comment id -> (first replies, cursor to the rest or None)
+    children = {}
+    frontier = [str(comment["_id"]) for comment in top]
     
-    # Update post comments count
-    await posts_collection.update_one(
-        {"_id": ObjectId(comment.post_id)},
-        {"$inc": {"comments_count": 1}}
-    )
+    for _ in range(depth):
+        if not frontier:
+            break
+        replies_by_parent = await get_first_replies(post_id, frontier, replies_per_comment + 1)
+        next_frontier = []
+        for parent_id, replies in replies_by_parent.items():
+            more_cursor = None
+            if len(replies) > replies_per_comment:
+                more_cursor = encode_cursor(replies[replies_per_comment - 1])
+                replies = replies[:replies_per_comment]
+            children[parent_id] = (replies, more_cursor)
+            loaded.extend(replies)
+            next_frontier.extend(str(reply["_id"]) for reply in replies)
+        frontier = next_frontier
     
-    return CommentResponse(
-        id=str(created_comment["_id"]),
-        content=created_comment["content"],
-        post_id=created_comment["post_id"],
-        parent_comment_id=created_comment.get("parent_comment_id"),
-        author_id=created_comment["author_id"],
-        author_name=created_comment["author_name"],
-        author_username=created_comment["author_username"],
-        author_profile_picture=created_comment.get("author_profile_picture", ""),
-        replies=[],
-        created_at=created_comment["created_at"],
-        updated_at=created_comment["updated_at"]
-    )
+    # Nodes on the last expanded level only report whether replies exist
+    unexpanded = await get_parents_with_replies(post_id, frontier) if frontier else set()
+    
+    await authors.hydrate(loaded)
+    
+    def build(comment: dict) -> dict:
+        node = thread_node(comment)
+        replies, more_cursor = children.get(node["id"], ([], None))
+        node["replies"] = [build(reply) for reply in replies]
+        if more_cursor:
+            node["has_more_replies"] = True
+            node["replies_cursor"] = more_cursor
+        elif node["id"] in unexpanded:
+            node["has_more_replies"] = True
+        return node
+    
+    return ORJSONResponse({"comments": [build(comment) for comment in top], "next_cursor": next_cursor})
 
-@router.get("/{post_id}", response_model=List[CommentResponse])
-async def get_post_comments(post_id: str):
-    # Check if post exists
-    post = await get_post_by_id(post_id)
+@router.get("/{post_id}/thread", response_model=CommentThreadPage)
+async def get_post_comment_thread(
+    post_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    replies: int = Query(3, ge=1, le=10),
+    depth: int = Query(3, ge=0, le=5),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
+    """Root comments of a post, paged by cursor, with nested replies expanded lazily"""
+    post = await get_post_by_id(post_id, projection={"_id": 1})
     if not post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
     
-    comments = await get_comments_by_post_id(post_id)
-    
-    # Organize comments with replies
-    comments_dict = {}
-    root_comments = []
+    return await load_thread(post_id, None, cursor, limit, replies, depth, authors)
+
+@router.get("/{post_id}/replies/{comment_id}", response_model=CommentThreadPage)
+async def get_comment_replies(
+    post_id: str,
+    comment_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    replies: int = Query(3, ge=1, le=10),
+    depth: int = Query(2, ge=0, le=5),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
+    """Direct replies to a comment, paged by cursor, with their replies expanded lazily"""
+    comment = await find_comment(comment_id)
+    if not comment or comment["post_id"] != post_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Comment not found"
+        )
     
-    for comment in comments:
-        comment_response = CommentResponse(
-            id=str(comment["_id"]),
-            content=comment["content"],
-            post_id=comment["post_id"],
-            parent_comment_id=comment.get("parent_comment_id"),
-            author_id=comment["author_id"],
-            author_name=comment["author_name"],
-            author_username=comment["author_username"],
-            author_profile_picture=comment.get("author_profile_picture", ""),
-            replies=[],
-            created_at=comment["created_at"],
-            updated_at=comment["updated_at"]
+    return await load_thread(post_id, comment_id, cursor, limit, replies, depth, authors)
+
+@router.get("/{post_id}", response_model=List[CommentResponse])
+async def get_post_comments(
+    post_id: str,
+    if_none_match: Optional[str] = Header(None),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
+    # The post read is the existence check, and its comment count (moved
+    # only after a comment is readable) versions the list. Both reads are
+    # shared with concurrent requests and run side by side
+    if AUTHOR_HYDRATION:
+        # Author fields come from user documents, so profile edits change the list too
+        post, authors_version = await asyncio.gather(read_post(post_id), get_version(AUTHORS_VERSION_ID))
+    else:
+        post, authors_version = await read_post(post_id), None
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found"
         )
-        
-        comments_dict[str(comment["_id"])] = comment_response
-        
-        if not comment.get("parent_comment_id"):
-            root_comments.append(comment_response)
     
-    # Attach replies to parent comments
-    for comment in comments:
-        if comment.get("parent_comment_id"):
-            parent_id = comment["parent_comment_id"]
-            if parent_id in comments_dict:
-                comments_dict[parent_id].replies.append(comments_dict[str(comment["_id"])])
+    # A repeat poll is answered from the count alone
+    current_etag = weak_etag("comments", post_id, post.get("comments_count", 0), authors_version)
+    if etag_matches(if_none_match, current_etag):
+        return not_modified(current_etag, COMMENTS_CACHE_CONTROL)
     
-    return root_comments
+    # The list may be cached apart from the post, so the ETag sent with it
+    # counts the comments actually served; a client holding it then gets
+    # the list again if the post had moved on
+    comments = await read_comments(post_id)
+    etag = weak_etag("comments", post_id, len(comments), authors_version)
+    comments = await authors.hydrate(comments)
+    return ORJSONResponse(build_comment_tree(comments), headers=cache_headers(etag, COMMENTS_CACHE_CONTROL))
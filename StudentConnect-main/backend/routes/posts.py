@@ -1,18 +1,39 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form, Query, Header
+from fastapi.responses import ORJSONResponse
+from typing import List, Literal, Optional
 from datetime import datetime
-from models.schemas import PostCreate, PostResponse, PostType
+from models.schemas import PostCreate, PostResponse, PostSummaryResponse, PostType
 from models.database import (
     create_post, 
     get_posts, 
     get_post_by_id,
-    get_user_posts
+    get_post_contents,
+    get_user_posts,
+    get_feed_version
 )
+from models.hot_feed import HotPage, hot_feed
+from models.search import index_post, search_posts
+from models.serializers import post_to_wire
 from utils.auth import get_current_user
-from utils.cloudinary import upload_file_to_cloudinary
+from utils.authors import AuthorLoader, author_fields, get_author_loader, stored_author_fields
+from utils.storage import MAX_DOCUMENT_BYTES, UploadTooLarge, save_upload
+from utils.pagination import encode_cursor
+from utils.post_reads import read_post
+from utils.warmup import warmup_hook
+from utils.http_cache import (
+    FEED_CACHE_CONTROL, POST_CACHE_CONTROL, POST_VERSION_FIELDS,
+    cache_headers, etag_matches, not_modified, post_etag, weak_etag
+)
+from utils.fieldsets import SUMMARY_FIELDS, make_excerpt, parse_fields, post_projection, sparse_post, wants_authors
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
 
+def parse_tags(tags: Optional[str]) -> list:
+    """Split the comma-separated tags form field"""
+    return [tag.strip() for tag in tags.split(",")] if tags else []
+
 @router.post("/", response_model=PostResponse)
 async def create_new_post(
     title: str = Form(...),
@@ -23,20 +44,16 @@ async def create_new_post(
     company: Optional[str] = Form(None),
     location: Optional[str] = Form(None),
     document: Optional[UploadFile] = File(None),
-    current_user = Depends(get_current_user)
+    current_user = Depends(get_current_user),
+    authors: AuthorLoader = Depends(get_author_loader)
 ):
-    # Parse tags
-    tags_list = [tag.strip() for tag in tags.split(",")] if tags else []
-    
     post_data = {
         "title": title,
         "content": content,
         "post_type": post_type,
-        "tags": tags_list,
-        "author_id": str(current_user["_id"]),
-        "author_name": current_user["name"],
-        "author_username": current_user["username"],
-        "author_profile_picture": current_user.get("profile_picture", ""),
+        "tags": parse_tags(tags),
+        **stored_author_fields(current_user),
+        "excerpt": make_excerpt(content),
         "comments_count": 0,
         "created_at": datetime.utcnow(),
         "updated_at": datetime.utcnow()
@@ -45,12 +62,18 @@ async def create_new_post(
     # Handle file upload for notes
     if post_type == PostType.notes and document:
         try:
-            upload_result = await upload_file_to_cloudinary(
-                document.file, 
-                folder="documents"
+            upload_result = await save_upload(
+                document,
+                folder="documents",
+                max_bytes=MAX_DOCUMENT_BYTES
             )
             post_data["document_url"] = upload_result["url"]
             post_data["document_name"] = document.filename
+        except UploadTooLarge as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -69,94 +92,145 @@ async def create_new_post(
         post_data["location"] = location
     
     created_post = await create_post(post_data)
+    await index_post({**created_post, **author_fields(current_user)})
     
-    return PostResponse(
-        id=str(created_post["_id"]),
-        title=created_post["title"],
-        content=created_post["content"],
-        post_type=created_post["post_type"],
-        tags=created_post["tags"],
-        author_id=created_post["author_id"],
-        author_name=created_post["author_name"],
-        author_username=created_post["author_username"],
-        author_profile_picture=created_post.get("author_profile_picture", ""),
-        document_url=created_post.get("document_url"),
-        document_name=created_post.get("document_name"),
-        job_link=created_post.get("job_link"),
-        company=created_post.get("company"),
-        location=created_post.get("location"),
-        comments_count=created_post["comments_count"],
-        created_at=created_post["created_at"],
-        updated_at=created_post["updated_at"]
-    )
+    authors.prime(current_user)
+    await authors.hydrate([created_post])
+    return ORJSONResponse(post_to_wire(created_post))
+
+def next_cursor_headers(posts: list, limit: int) -> dict:
+    """Advertise the cursor for the following page when this one was full"""
+    if len(posts) == limit:
+        return {NEXT_CURSOR_HEADER: encode_cursor(posts[-1])}
+    return {}
 
-@router.get("/", response_model=List[PostResponse])
+def requested_fields(view: str, fields: Optional[str]) -> Optional[list]:
+    """Response fields for a sparse list, or None for full posts"""
+    try:
+        selected = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    if selected is None and view == "summary":
+        selected = SUMMARY_FIELDS
+    return selected
+
+async def posts_response(posts: list, fields: Optional[list], headers: dict, authors: AuthorLoader) -> ORJSONResponse:
+    """Serialize a page of posts, full or sparse"""
+    if fields is None:
+        await authors.hydrate(posts)
+        return ORJSONResponse([post_to_wire(post) for post in posts], headers=headers)
+    if wants_authors(fields):
+        await authors.hydrate(posts)
+    return await sparse_posts_response(posts, fields, headers)
+
+async def sparse_posts_response(posts: list, fields: list, headers: dict) -> ORJSONResponse:
+    """Serialize projected posts; posts stored before excerpts existed get one from their content"""
+    if "excerpt" in fields:
+        missing = [post["_id"] for post in posts if "excerpt" not in post]
+        if missing:
+            contents = await get_post_contents(missing)
+            for post in posts:
+                if post["_id"] in contents:
+                    post["excerpt"] = make_excerpt(contents[post["_id"]])
+    return ORJSONResponse([sparse_post(post, fields) for post in posts], headers=headers)
+
+async def hot_page_response(page: HotPage, fields: Optional[list], headers: dict, authors: AuthorLoader) -> ORJSONResponse:
+    """Serialize a feed page held in memory; full posts are already serialized"""
+    if fields is None and page.entries and page.entries[0].wire is not None:
+        return ORJSONResponse([entry.wire for entry in page.entries], headers=headers)
+    # Hydration fills in fields, so work on copies of the shared documents
+    return await posts_response([dict(post) for post in page.posts], fields, headers, authors)
+
+@router.get("/", response_model=List[PostResponse], responses={200: {"model": List[PostSummaryResponse]}})
 async def get_all_posts(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     post_type: Optional[PostType] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; overrides view"),
+    if_none_match: Optional[str] = Header(None),
+    authors: AuthorLoader = Depends(get_author_loader)
 ):
-    posts = await get_posts(skip=skip, limit=limit, post_type=post_type, search=search)
+    selected = requested_fields(view, fields)
+    projection = post_projection(selected) if selected else None
+    # Feed head pages come from memory when it is current (models/hot_feed.py)
+    hot = None if search else hot_feed.page(post_type, skip, limit, cursor)
+    headers = {}
+    if not search and not cursor and skip == 0:
+        # First feed page: unchanged as long as the feed version is. Read the
+        # version before the posts so a concurrent write can only make it stale
+        version = hot.version if hot is not None else await get_feed_version()
+        etag = weak_etag("feed", version, post_type, limit, view, fields)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, FEED_CACHE_CONTROL)
+        headers.update(cache_headers(etag, FEED_CACHE_CONTROL))
     
-    return [
-        PostResponse(
-            id=str(post["_id"]),
-            title=post["title"],
-            content=post["content"],
-            post_type=post["post_type"],
-            tags=post["tags"],
-            author_id=post["author_id"],
-            author_name=post["author_name"],
-            author_username=post["author_username"],
-            author_profile_picture=post.get("author_profile_picture", ""),
-            document_url=post.get("document_url"),
-            document_name=post.get("document_name"),
-            job_link=post.get("job_link"),
-            company=post.get("company"),
-            location=post.get("location"),
-            comments_count=post["comments_count"],
-            created_at=post["created_at"],
-            updated_at=post["updated_at"]
-        )
-        for post in posts
-    ]
+    if hot is not None:
+        headers.update(next_cursor_headers(hot.posts, limit))
+        return await hot_page_response(hot, selected, headers, authors)
+    if search:
+        # Relevance-ranked results page with skip; cursors follow feed order only
+        posts = await search_posts(search, skip=skip, limit=limit, post_type=post_type, projection=projection)
+    else:
+        try:
+            posts = await get_posts(skip=skip, limit=limit, post_type=post_type, cursor=cursor, projection=projection)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        headers.update(next_cursor_headers(posts, limit))
+    
+    return await posts_response(posts, selected, headers, authors)
+
+@warmup_hook
+async def warm_first_feed_page():
+    """Load the first feed page once so its queries, plans and author cache are warm"""
+    await get_all_posts(
+        skip=0, limit=20, post_type=None, search=None, cursor=None,
+        view="full", fields=None, if_none_match=None, authors=AuthorLoader()
+    )
 
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post(post_id: str):
-    post = await get_post_by_id(post_id)
+async def get_post(
+    post_id: str,
+    if_none_match: Optional[str] = Header(None),
+    authors: AuthorLoader = Depends(get_author_loader)
+):
+    if if_none_match:
+        # Revalidation: compare against the version fields before loading the whole post
+        version = await get_post_by_id(post_id, projection=POST_VERSION_FIELDS)
+        if version:
+            await authors.hydrate([version])
+            if etag_matches(if_none_match, post_etag(version)):
+                return not_modified(post_etag(version), POST_CACHE_CONTROL)
+    
+    post = await read_post(post_id)
     if not post:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
     
-    return PostResponse(
-        id=str(post["_id"]),
-        title=post["title"],
-        content=post["content"],
-        post_type=post["post_type"],
-        tags=post["tags"],
-        author_id=post["author_id"],
-        author_name=post["author_name"],
-        author_username=post["author_username"],
-        author_profile_picture=post.get("author_profile_picture", ""),
-        document_url=post.get("document_url"),
-        document_name=post.get("document_name"),
-        job_link=post.get("job_link"),
-        company=post.get("company"),
-        location=post.get("location"),
-        comments_count=post["comments_count"],
-        created_at=post["created_at"],
-        updated_at=post["updated_at"]
-    )
+    await authors.hydrate([post])
+    return ORJSONResponse(post_to_wire(post), headers=cache_headers(post_etag(post), POST_CACHE_CONTROL))
 
-@router.get("/user/{username}", response_model=List[PostResponse])
+@router.get("/user/{username}", response_model=List[PostResponse], responses={200: {"model": List[PostSummaryResponse]}})
 async def get_user_posts_by_username(
     username: str,
     skip: int = Query(0, ge=0),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    view: Literal["full", "summary"] = "full",
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; overrides view"),
+    authors: AuthorLoader = Depends(get_author_loader)
 ):
+    selected = requested_fields(view, fields)
     from models.database import get_user_by_username
     user = await get_user_by_username(username)
     if not user:
@@ -165,27 +239,18 @@ async def get_user_posts_by_username(
             detail="User not found"
         )
     
-    posts = await get_user_posts(str(user["_id"]), skip=skip, limit=limit)
-    
-    return [
-        PostResponse(
-            id=str(post["_id"]),
-            title=post["title"],
-            content=post["content"],
-            post_type=post["post_type"],
-            tags=post["tags"],
-            author_id=post["author_id"],
-            author_name=post["author_name"],
-            author_username=post["author_username"],
-            author_profile_picture=post.get("author_profile_picture", ""),
-            document_url=post.get("document_url"),
-            document_name=post.get("document_name"),
-            job_link=post.get("job_link"),
-            company=post.get("company"),
-            location=post.get("location"),
-            comments_count=post["comments_count"],
-            created_at=post["created_at"],
-            updated_at=post["updated_at"]
+    try:
+        posts = await get_user_posts(
+            str(user["_id"]), skip=skip, limit=limit, cursor=cursor,
+            projection=post_projection(selected) if selected else None
         )
-        for post in posts
-    ]
\ No newline at end of file
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    headers = next_cursor_headers(posts, limit)
+    
+    # The user was just loaded; no need to look them up again as an author
+    authors.prime(user)
+    return await posts_response(posts, selected, headers, authors)
\ No newline at end of file
@@ -1,26 +1,105 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from decouple import config
-from models.database import get_user_by_email
+from models.database import USERS_VERSION_ID, bump_version, get_user_by_email, get_version
 from models.schemas import TokenData
+from utils.cache import SharedVersion, TTLCache
+from utils.metrics import password_hashing
+from utils.settings import settings
 
 # Security
-SECRET_KEY = config("SECRET_KEY", default="your-secret-key-here")
+SECRET_KEY = settings.secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing. Changing BCRYPT_ROUNDS (or the scheme list) makes stored
+# hashes "need update", and login transparently rehashes them.
+BCRYPT_ROUNDS = settings.bcrypt_rounds
+# bcrypt releases the GIL, so each worker thread can use a CPU core.
+# 0 runs hashing inline on the event loop (only useful for benchmarking).
+PASSWORD_HASH_WORKERS = settings.password_hash_workers
+# How long a request may wait for a free worker before getting a 503
+PASSWORD_HASH_QUEUE_TIMEOUT = settings.password_hash_queue_timeout
+
+# Authenticated users, keyed by token subject (email). Call user_changed()
+# whenever a stored user document changes. It drops the entry here and bumps
+# the shared users version, which retires it on every other worker within
+# CACHE_VERSION_CHECK_SECONDS.
+USER_CACHE_SIZE = settings.user_cache_size
+USER_CACHE_TTL_SECONDS = settings.user_cache_ttl_seconds
+CACHE_VERSION_CHECK_SECONDS = settings.cache_version_check_seconds
+user_cache = TTLCache("users", maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+users_version = SharedVersion("users", lambda: get_version(USERS_VERSION_ID), CACHE_VERSION_CHECK_SECONDS)
+
 security = HTTPBearer()
 
+_pwd_context = None
+_password_executor = None
+_password_slots = None
+
+def password_context():
+    """The passlib context, built on first use so startup does not import passlib"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return _pwd_context
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_context().hash(password)
+
+def _timed_password_work(func, *args):
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        password_hashing.observe(func.__name__, value=time.perf_counter() - started)
+
+async def _run_password_work(func, *args):
+    """Run a bcrypt call on the bounded password pool instead of the event loop"""
+    global _password_executor, _password_slots
+    if PASSWORD_HASH_WORKERS <= 0:
+        return _timed_password_work(func, *args)
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            thread_name_prefix="password-hash"
+        )
+        _password_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+    
+    try:
+        await asyncio.wait_for(_password_slots.acquire(), timeout=PASSWORD_HASH_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"},
+        )
+    # The slot is held until the bcrypt job itself finishes. A request
+    # cancelled meanwhile (client gone) stops waiting, but its job keeps the
+    # slot, so aborted logins cannot pile up work behind the semaphore
+    job = asyncio.get_running_loop().run_in_executor(_password_executor, _timed_password_work, func, *args)
+    job.add_done_callback(_release_password_slot)
+    return await asyncio.shield(job)
+
+def _release_password_slot(job):
+    if not job.cancelled():
+        job.exception()  # retrieved, so an abandoned job's error is not logged as unhandled
+    _password_slots.release()
+
+async def verify_password_async(plain_password, hashed_password):
+    """Verify off the event loop; returns (is_valid, new_hash or None)"""
+    return await _run_password_work(password_context().verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_password_work(password_context().hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -29,6 +108,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -38,6 +118,7 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -47,10 +128,19 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_by_email(email=token_data.email)
+    version = await users_version.current()
+    user = user_cache.get(token_data.email, version)
     if user is None:
-        raise credentials_exception
+        user = await get_user_by_email(email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        user_cache.set(token_data.email, user, version)
     return user
 
+async def user_changed(email: str):
+    """Drop a user from the auth cache of every worker after their document changed"""
+    user_cache.invalidate(email)
+    users_version.observe(await bump_version(USERS_VERSION_ID))
+
 async def get_current_user(user = Depends(verify_token)):
     return user
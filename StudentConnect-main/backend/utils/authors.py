@@ -0,0 +1,104 @@
+"""
+Read-time author hydration for posts and comments.
+
+By default posts and comments keep a denormalized copy of their author's
+name, username and profile picture. With AUTHOR_HYDRATION=true new posts
+and comments store only author_id, and routes fill the author fields in
+when reading, so a profile edit is a single write to the user document.
+
+Each request gets its own AuthorLoader (the `get_author_loader`
+dependency). It resolves every author the request needs with at most one
+`$in` query per call, backed by a short-lived cache shared by all requests.
+Cache entries are stored under the shared authors version, which
+routes/auth.py bumps on every profile edit. Another worker therefore stops
+serving the old author within CACHE_VERSION_CHECK_SECONDS.
+"""
+from bson import ObjectId
+from models.database import AUTHORS_VERSION_ID, get_users_by_ids, get_version
+from utils.cache import SharedVersion, TTLCache
+from utils.settings import settings
+
+AUTHOR_HYDRATION = settings.author_hydration
+
+AUTHOR_CACHE_SIZE = settings.author_cache_size
+AUTHOR_CACHE_TTL_SECONDS = settings.author_cache_ttl_seconds
+CACHE_VERSION_CHECK_SECONDS = settings.cache_version_check_seconds
+author_cache = TTLCache("authors", maxsize=AUTHOR_CACHE_SIZE, ttl=AUTHOR_CACHE_TTL_SECONDS)
+authors_version = SharedVersion("authors", lambda: get_version(AUTHORS_VERSION_ID), CACHE_VERSION_CHECK_SECONDS)
+
+AUTHOR_FIELDS = ("author_name", "author_username", "author_profile_picture")
+AUTHOR_PROJECTION = {"name": 1, "username": 1, "profile_picture": 1}
+
+
+def author_fields(user: dict) -> dict:
+    """The author_* fields shown on a post or comment by `user`"""
+    return {
+        "author_name": user["name"],
+        "author_username": user["username"],
+        "author_profile_picture": user.get("profile_picture", "")
+    }
+
+
+def stored_author_fields(user: dict) -> dict:
+    """Author fields to store on a new post or comment"""
+    if AUTHOR_HYDRATION:
+        return {"author_id": str(user["_id"])}
+    return {"author_id": str(user["_id"]), **author_fields(user)}
+
+
+def invalidate_author(user_id: str, version: int):
+    """Drop an author here; `version` is the authors version just bumped for the edit"""
+    author_cache.invalidate(user_id)
+    authors_version.observe(version)
+
+
+class AuthorLoader:
+    """Per-request batcher resolving author ids to their author_* fields"""
+
+    def __init__(self):
+        self._loaded = {}
+
+    def prime(self, user: dict):
+        """Seed the loader with a user document the request already has"""
+        self._loaded[str(user["_id"])] = author_fields(user)
+
+    async def load_many(self, author_ids) -> dict:
+        missing = []
+        version = None
+        for author_id in set(author_ids):
+            if author_id in self._loaded:
+                continue
+            if version is None:
+                version = await authors_version.current()
+            cached = author_cache.get(author_id, version)
+            if cached is not None:
+                self._loaded[author_id] = cached
+            elif ObjectId.is_valid(author_id):
+                missing.append(ObjectId(author_id))
+
+        if missing:
+            for user in await get_users_by_ids(missing, AUTHOR_PROJECTION):
+                fields = author_fields(user)
+                author_cache.set(str(user["_id"]), fields, version)
+                self._loaded[str(user["_id"])] = fields
+
+        return {author_id: self._loaded[author_id] for author_id in author_ids if author_id in self._loaded}
+
+    async def hydrate(self, items: list) -> list:
+        """Fill in author_* fields on documents (or response dicts) in place"""
+        if not AUTHOR_HYDRATION or not items:
+            return items
+        authors = await self.load_many([item["author_id"] for item in items if item.get("author_id")])
+        for item in items:
+            fields = authors.get(item.get("author_id"))
+            if fields is not None:
+                item.update(fields)
+            else:
+                # Author no longer exists: keep whatever copy the item has
+                for name in AUTHOR_FIELDS:
+                    item.setdefault(name, "")
+        return items
+
+
+def get_author_loader() -> AuthorLoader:
+    return AuthorLoader()
@@ -0,0 +1,146 @@
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+# Every TTLCache and SingleFlight, for the metrics served from /metrics
+_caches = weakref.WeakSet()
+_flights = weakref.WeakSet()
+
+
+def all_caches() -> list:
+    return sorted(_caches, key=lambda cache: cache.name)
+
+
+def all_flights() -> list:
+    return sorted(_flights, key=lambda flight: flight.name)
+
+
+class TTLCache:
+    """In-process LRU cache whose entries also expire after `ttl` seconds.
+
+    Entries may be stored under a version (see SharedVersion); get() with a
+    different version treats them as missing.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        _caches.add(self)
+
+    def get(self, key: Hashable, version: Optional[int] = None) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, entry_version = entry
+        if expires_at <= time.monotonic() or entry_version != version:
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value, version)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one run of the coroutine.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task and get the same result (or
+    exception). Cancelling one caller does not cancel the work for the
+    others. Results are shared objects, so callers must not mutate them.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.shared = 0
+        self._tasks = {}
+        _flights.add(self)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable]) -> Any:
+        self.calls += 1
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Future):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Retrieved here so a failure nobody waited for is not logged as unhandled
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": len(self._tasks),
+            "calls": self.calls,
+            "shared": self.shared,
+        }
+
+
+class SharedVersion:
+    """A version counter shared by every worker through the database.
+
+    Caches store entries under current() and look them up under current(),
+    so bumping the counter on one worker retires the entries on all of
+    them. The counter is read at most once every `refresh_seconds` (with
+    concurrent readers sharing the query), which bounds how long another
+    worker can serve an entry from before the bump.
+    """
+
+    def __init__(self, name: str, load: Callable[[], Awaitable[int]], refresh_seconds: float):
+        self.name = name
+        self.refresh_seconds = refresh_seconds
+        self._load = load
+        self._value = None
+        self._read_at = 0.0
+        self._flight = SingleFlight(f"{name}_version")
+
+    async def current(self) -> int:
+        if self._value is None or time.monotonic() - self._read_at >= self.refresh_seconds:
+            self.observe(await self._flight.do(None, self._load))
+        return self._value
+
+    def observe(self, value: int):
+        """Record a value read from, or just written to, the database"""
+        self._value = value if self._value is None else max(self._value, value)
+        self._read_at = time.monotonic()
@@ -1,27 +1,26 @@
-import os
 import cloudinary
 import cloudinary.uploader
-from pathlib import Path
-from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from utils.settings import settings
 
-# Load environment variables
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
-
-# Cloudinary configuration
+# Cloudinary configuration. utils/storage.py imports this module on the first
+# upload, so the SDK is not loaded at startup.
 cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET")
+    cloud_name=settings.cloudinary_cloud_name,
+    api_key=settings.cloudinary_api_key,
+    api_secret=settings.cloudinary_api_secret
 )
 
-async def upload_file_to_cloudinary(file, folder="documents"):
+# Files are sent in parts of this size (Cloudinary requires at least 5MB)
+UPLOAD_CHUNK_BYTES = settings.upload_chunk_bytes
+
+async def upload_file_to_cloudinary(file, folder="documents", filename=None):
+    """Upload a file object in chunks from a worker thread, off the event loop"""
     try:
-        result = cloudinary.uploader.upload(
-            file,
-            folder=folder,
-            resource_type="auto"
-        )
+        options = {"folder": folder, "resource_type": "auto", "chunk_size": UPLOAD_CHUNK_BYTES}
+        if filename:
+            options["filename"] = filename
+        result = await run_in_threadpool(cloudinary.uploader.upload_large, file, **options)
         return {
             "url": result["secure_url"],
             "public_id": result["public_id"]
@@ -31,7 +30,7 @@ async def upload_file_to_cloudinary(file, folder="documents"):
 
 async def delete_file_from_cloudinary(public_id):
     try:
-        result = cloudinary.uploader.destroy(public_id)
+        result = await run_in_threadpool(cloudinary.uploader.destroy, public_id)
         return result
     except Exception as e:
         raise Exception(f"Failed to delete file: {str(e)}")
@@ -0,0 +1,69 @@
+"""
+Sparse fieldsets for post lists.
+
+`?view=summary` returns PostSummaryResponse objects: everything a feed card
+needs, with a short server-computed excerpt in place of the full content.
+`?fields=title,author_name,...` returns only the named fields (plus id).
+Both push a projection down into the Mongo query so unused fields are never
+sent over the wire.
+"""
+from typing import Optional
+from models.schemas import PostResponse, PostSummaryResponse
+
+EXCERPT_CHARS = 200
+
+# Response field -> document field
+POST_FIELD_MAP = {name: name for name in PostResponse.model_fields}
+POST_FIELD_MAP["id"] = "_id"
+POST_FIELD_MAP["excerpt"] = "excerpt"
+
+SUMMARY_FIELDS = list(PostSummaryResponse.model_fields)
+
+
+def make_excerpt(content: str) -> str:
+    """First EXCERPT_CHARS characters of the content, cut at a word boundary"""
+    content = " ".join((content or "").split())
+    if len(content) <= EXCERPT_CHARS:
+        return content
+    cut = content[:EXCERPT_CHARS].rsplit(" ", 1)[0]
+    return cut.rstrip(".,;:!?") + "…"
+
+
+def parse_fields(fields: Optional[str]) -> Optional[list]:
+    """Split ?fields= into known response fields; raises ValueError on unknown names"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in POST_FIELD_MAP]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ["id"] + [name for name in names if name != "id"]
+
+
+def wants_authors(fields: list) -> bool:
+    """Whether any author_* field other than the id was requested"""
+    return any(name.startswith("author_") and name != "author_id" for name in fields)
+
+
+def post_projection(fields: list) -> dict:
+    """Mongo projection for the given response fields; always keeps the
+    created_at/_id pair that cursors are built from, and author_id when
+    author fields are resolved from it"""
+    projection = {POST_FIELD_MAP[name]: 1 for name in fields}
+    projection["created_at"] = 1
+    if wants_authors(fields):
+        projection["author_id"] = 1
+    return projection
+
+
+def sparse_post(post: dict, fields: list) -> dict:
+    """Response dict holding only `fields` from a projected post document"""
+    item = {}
+    for name in fields:
+        if name == "id":
+            item["id"] = str(post["_id"])
+        elif name == "excerpt":
+            item["excerpt"] = post["excerpt"] if "excerpt" in post else make_excerpt(post.get("content"))
+        else:
+            item[name] = post.get(POST_FIELD_MAP[name])
+    return item
@@ -0,0 +1,56 @@
+"""
+Conditional GET support for the read endpoints the frontend polls.
+
+Each route computes a weak ETag from a few cheap version fields (a post's
+updated_at/comments_count, the feed version counter) before loading or
+serializing anything. When it matches the client's If-None-Match the route
+answers 304 with no body; otherwise the full response carries the ETag and
+the route's Cache-Control policy.
+"""
+import hashlib
+from typing import Optional
+from fastapi import Response
+
+# Browsers may reuse a post for a few seconds, then must revalidate
+POST_CACHE_CONTROL = "public, max-age=5, must-revalidate"
+# New comments and posts should show up on the next poll: always revalidate
+COMMENTS_CACHE_CONTROL = "public, no-cache"
+FEED_CACHE_CONTROL = "public, no-cache"
+
+# Post fields the post ETag is derived from; everything else only changes with updated_at
+POST_VERSION_FIELDS = {
+    "updated_at": 1, "comments_count": 1,
+    "author_id": 1, "author_name": 1, "author_username": 1, "author_profile_picture": 1
+}
+
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def post_etag(post: dict) -> str:
+    """ETag for a post; `post` only needs the POST_VERSION_FIELDS, with
+    author fields hydrated when they are resolved at read time"""
+    return weak_etag(
+        post["_id"], post["updated_at"].isoformat(), post.get("comments_count", 0),
+        post.get("author_name", ""), post.get("author_username", ""), post.get("author_profile_picture", "")
+    )
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    ours = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == ours for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str, cache_control: str) -> dict:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
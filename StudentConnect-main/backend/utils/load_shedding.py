@@ -0,0 +1,203 @@
+"""
+Per-route-group concurrency limits with adaptive load shedding.
+
+Without a bound, a burst of uploads or bcrypt-heavy logins slows every
+route down together. ConcurrencyLimitMiddleware sorts each request into a
+group and lets at most CONCURRENCY_LIMIT_<GROUP> requests of that group run
+at once:
+
+    auth     signup, login and reset-password (bcrypt hash or verify)
+    uploads  post creation and profile pictures (multipart bodies, Cloudinary)
+    reads    every other GET under /api
+
+Other requests (comments, profile edits, /, /ready, /metrics) are not
+limited. A request that finds its group full waits in a FIFO queue for up
+to CONCURRENCY_QUEUE_TIMEOUT_SECONDS and then gets a 503 with Retry-After.
+
+The queue is adaptive, in the spirit of CoDel. Each group measures how long
+admitted requests waited. Once every request for a whole SHED_INTERVAL_SECONDS
+waited longer than CONCURRENCY_TARGET_QUEUE_MS, the group is overloaded.
+New requests that cannot start at once are then turned away immediately
+instead of queueing behind work that is already late. The group recovers
+as soon as one request waits less than the target. A saturated upload
+group therefore answers 503 fast while reads keep their own slots.
+
+Limits are per process. Shed and queued requests are counted in /metrics.
+"""
+import asyncio
+import time
+import weakref
+from collections import deque
+from utils.metrics import Gauge, registry
+from utils.settings import settings
+
+LOAD_SHEDDING_ENABLED = settings.load_shedding_enabled
+CONCURRENCY_QUEUE_TIMEOUT_SECONDS = settings.concurrency_queue_timeout_seconds
+CONCURRENCY_TARGET_QUEUE_MS = settings.concurrency_target_queue_ms
+# How long queue waits must stay above the target before shedding starts
+SHED_INTERVAL_SECONDS = 0.5
+RETRY_AFTER_SECONDS = 1
+
+_all_limits = weakref.WeakSet()
+
+shed_requests = registry.counter(
+    "studentconnect_load_shed_total",
+    "Requests rejected with 503 by the concurrency limits",
+    ("group", "reason"),
+)
+queue_wait = registry.histogram(
+    "studentconnect_concurrency_queue_wait_seconds",
+    "Time admitted requests waited for a concurrency slot",
+    ("group",),
+)
+
+
+class ConcurrencyLimit:
+    """At most `limit` holders at once, with a bounded, adaptive FIFO queue"""
+
+    def __init__(self, name: str, limit: int, queue_timeout: float = CONCURRENCY_QUEUE_TIMEOUT_SECONDS,
+                 target_queue_ms: float = CONCURRENCY_TARGET_QUEUE_MS, interval: float = SHED_INTERVAL_SECONDS):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.target = target_queue_ms / 1000
+        self.interval = interval
+        self.active = 0
+        self.shedding = False
+        self._waiters = deque()
+        # When waits have been above the target since; None while below it
+        self._above_target_since = None
+        _all_limits.add(self)
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def _observe(self, waited: float):
+        queue_wait.observe(self.name, value=waited)
+        now = time.monotonic()
+        if waited < self.target:
+            self._above_target_since = None
+            self.shedding = False
+        elif self._above_target_since is None:
+            self._above_target_since = now
+        elif now - self._above_target_since >= self.interval:
+            self.shedding = True
+
+    async def acquire(self) -> bool:
+        """Take a slot; False if the request should be shed"""
+        if self.active < self.limit and not self.queued:
+            self.active += 1
+            self._observe(0.0)
+            return True
+        if self.shedding:
+            shed_requests.inc(self.name, "overloaded")
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.cancel():
+                # The slot was handed over just as the wait timed out
+                self.release()
+            shed_requests.inc(self.name, "queue_timeout")
+            self._observe(time.monotonic() - started)
+            return False
+        except asyncio.CancelledError:
+            # Client went away while queued
+            if not waiter.cancel():
+                self.release()
+            raise
+        self._observe(time.monotonic() - started)
+        return True
+
+    def release(self):
+        # Hand the slot straight to the oldest live waiter, so a newcomer
+        # cannot overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+def route_groups(prefix: str = "/api") -> dict:
+    """Routes with their own concurrency group; other GETs under `prefix` are reads"""
+    return {
+        ("POST", f"{prefix}/auth/signup"): "auth",
+        ("POST", f"{prefix}/auth/login"): "auth",
+        ("POST", f"{prefix}/auth/reset-password"): "auth",
+        ("POST", f"{prefix}/posts/"): "uploads",
+        ("POST", f"{prefix}/auth/profile/picture"): "uploads",
+    }
+
+
+def concurrency_limits() -> dict:
+    return {
+        "auth": ConcurrencyLimit("auth", settings.concurrency_limit_auth),
+        "uploads": ConcurrencyLimit("uploads", settings.concurrency_limit_uploads),
+        "reads": ConcurrencyLimit("reads", settings.concurrency_limit_reads),
+    }
+
+
+class ConcurrencyLimitMiddleware:
+    """Hold each limited request to its group's concurrency limit, or answer 503"""
+
+    def __init__(self, app, limits: dict, groups: dict, prefix: str = "/api"):
+        self.app = app
+        self.limits = limits
+        self.groups = groups
+        self.prefix = prefix + "/"
+
+    def _group(self, scope):
+        group = self.groups.get((scope["method"], scope["path"]))
+        if group is None and scope["method"] in ("GET", "HEAD") and scope["path"].startswith(self.prefix):
+            group = "reads"
+        return group
+
+    async def _reject(self, send):
+        body = b'{"detail":"Server is busy, please retry shortly"}'
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http" and LOAD_SHEDDING_ENABLED:
+            limit = self.limits.get(self._group(scope))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not await limit.acquire():
+            await self._reject(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+
+def _collect_limits():
+    active = Gauge("studentconnect_concurrency_active", "Requests holding a concurrency slot", ("group",))
+    queued = Gauge("studentconnect_concurrency_queued", "Requests waiting for a concurrency slot", ("group",))
+    shedding = Gauge("studentconnect_concurrency_shedding", "1 while the group turns away requests that would queue", ("group",))
+    for limit in _all_limits:
+        active.set(limit.name, value=limit.active)
+        queued.set(limit.name, value=limit.queued)
+        shedding.set(limit.name, value=int(limit.shedding))
+    return active, queued, shedding
+
+
+registry.register_collector(_collect_limits)
@@ -0,0 +1,285 @@
+"""
+Prometheus-compatible metrics, without a client library.
+
+`registry` holds counters, gauges and histograms, and renders them in the
+Prometheus text exposition format from GET /metrics in main.py. Any scraper
+(or curl) can read it; nothing else has to run.
+
+Recorded here:
+- HTTP requests: RequestMetricsMiddleware times every request. It labels the
+  timing by method, route template (/api/posts/{post_id}, not the concrete
+  URL) and status code, and tracks requests in flight.
+- MongoDB commands: the CommandListener in utils/mongo_metrics.py records
+  each command's duration by collection and command name.
+- Password hashing: time spent in bcrypt calls (utils/auth.py).
+- Caches, request coalescing and the connection pool are read at scrape
+  time by collectors.
+
+Route labels come from the matched route, so the label set stays bounded.
+Requests that match no route are all labelled "unmatched".
+"""
+import threading
+import time
+from typing import Callable, Iterable, Sequence
+from starlette.routing import Match, Mount
+from utils.cache import all_caches, all_flights
+
+# Seconds; spans a cached read (~1ms) up to a bcrypt verify under load
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: tuple) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, *labels, value: float):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels, amount: float = 1.0):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., +Inf count], sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            state[1] += value
+
+    def count(self, *labels) -> int:
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((labels, (list(state[0]), state[1])) for labels, state in self._values.items())
+        bucket_labelnames = self.labelnames + ("le",)
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_value(bound)
+                yield f"{self.name}_bucket{_format_labels(bucket_labelnames, labels + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def register_collector(self, collect: Callable[[], Iterable[_Metric]]):
+        """`collect` builds fresh metrics from some other source on every scrape"""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for metric in collect():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.histogram(
+    "studentconnect_http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ("method", "route", "status"),
+)
+http_in_flight = registry.gauge(
+    "studentconnect_http_requests_in_flight",
+    "HTTP requests currently being served",
+    ("method",),
+)
+mongo_commands = registry.histogram(
+    "studentconnect_mongo_command_duration_seconds",
+    "MongoDB command latency by collection and command",
+    ("collection", "command", "outcome"),
+)
+password_hashing = registry.histogram(
+    "studentconnect_password_hash_seconds",
+    "Time spent in bcrypt hash and verify calls",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.0),
+)
+
+
+def _collect_caches():
+    hits = Counter("studentconnect_cache_hits_total", "In-process cache hits", ("cache",))
+    misses = Counter("studentconnect_cache_misses_total", "In-process cache misses", ("cache",))
+    evictions = Counter("studentconnect_cache_evictions_total", "Entries evicted to stay under maxsize", ("cache",))
+    size = Gauge("studentconnect_cache_entries", "Entries currently cached", ("cache",))
+    for cache in all_caches():
+        stats = cache.stats()
+        hits.inc(cache.name, amount=stats["hits"])
+        misses.inc(cache.name, amount=stats["misses"])
+        evictions.inc(cache.name, amount=stats["evictions"])
+        size.set(cache.name, value=stats["size"])
+    return hits, misses, evictions, size
+
+
+registry.register_collector(_collect_caches)
+
+
+def _collect_flights():
+    calls = Counter("studentconnect_singleflight_calls_total", "Reads requested through a SingleFlight", ("flight",))
+    shared = Counter("studentconnect_singleflight_shared_total", "Reads that joined a query already in flight", ("flight",))
+    ratio = Gauge("studentconnect_singleflight_coalesced_ratio", "Share of reads served by another caller's query", ("flight",))
+    for flight in all_flights():
+        stats = flight.stats()
+        calls.inc(flight.name, amount=stats["calls"])
+        shared.inc(flight.name, amount=stats["shared"])
+        ratio.set(flight.name, value=stats["shared"] / stats["calls"] if stats["calls"] else 0.0)
+    return calls, shared, ratio
+
+
+registry.register_collector(_collect_flights)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")  # set by FastAPI when an APIRoute matches
+    if route is not None:
+        return route.path
+    app = scope.get("app")
+    for candidate in getattr(app, "routes", ()):
+        # Mounts such as /media are not APIRoutes
+        if isinstance(candidate, Mount) and candidate.matches(scope)[0] == Match.FULL:
+            return f"{candidate.path}/{{path}}"
+    return "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Time each HTTP request and label it with its route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        started = time.perf_counter()
+        # The route is only known once the router has matched, so requests in
+        # flight are counted per method
+        http_in_flight.inc(method)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.dec(method)
+            http_requests.observe(method, _route_template(scope), status_code, value=time.perf_counter() - started)
@@ -0,0 +1,154 @@
+"""
+MongoDB connection pool and command metrics.
+
+`PoolMetrics` is a pymongo ConnectionPoolListener registered on the client
+in models/database.py. It tracks how many connections are open and checked
+out, and how long requests wait to check one out. A growing wait time, or
+in-use counts pinned at MONGO_MAX_POOL_SIZE, means the pool is smaller than
+the request concurrency. The numbers are served from /metrics/pool in
+main.py.
+
+Motor runs pymongo in worker threads, so checkouts start and finish on the
+same thread and are timed with a thread-local start time.
+
+`CommandMetrics` is a CommandListener that records every command's duration
+in the studentconnect_mongo_command_duration_seconds histogram served from
+/metrics, labelled by collection and command name.
+"""
+import threading
+import time
+from pymongo import monitoring
+from utils.metrics import Gauge, mongo_commands, registry
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open = 0
+            self.in_use = 0
+            self.max_in_use = 0
+            self.checkouts = 0
+            self.checkout_failures = {}
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+    # --- checkouts ---
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        waited = time.perf_counter() - started if started is not None else 0.0
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    # --- pool size ---
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open = max(self.open - 1, 0)
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+
+pool_metrics = PoolMetrics()
+
+
+# Commands whose first field is not a collection name
+_NO_COLLECTION = {"getMore", "killCursors", "endSessions", "ping", "hello", "isMaster", "ismaster", "buildInfo"}
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self, max_pending: int = 10_000):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # Started events carry the command; finished events only its ids
+        self._pending = {}
+
+    @staticmethod
+    def _collection(event) -> str:
+        if event.command_name == "getMore":
+            return str(event.command.get("collection", "-"))
+        target = event.command.get(event.command_name)
+        if event.command_name in _NO_COLLECTION or not isinstance(target, str):
+            return "-"
+        return target
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "-")
+        mongo_commands.observe(collection, event.command_name, outcome, value=event.duration_micros / 1_000_000)
+
+    def started(self, event):
+        with self._lock:
+            if len(self._pending) < self.max_pending:
+                self._pending[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+
+command_metrics = CommandMetrics()
+
+
+def _collect_pool():
+    snapshot = pool_metrics.snapshot()
+    open_connections = Gauge("studentconnect_mongo_pool_connections", "Open MongoDB connections")
+    in_use = Gauge("studentconnect_mongo_pool_connections_in_use", "MongoDB connections checked out")
+    open_connections.set(value=snapshot["open"])
+    in_use.set(value=snapshot["in_use"])
+    return open_connections, in_use
+
+
+registry.register_collector(_collect_pool)
@@ -0,0 +1,247 @@
+"""
+Persistent email outbox with a background SMTP sender.
+
+Routes call `enqueue_email()`, which only inserts a document into the
+email_outbox collection. `OutboxSender` runs as a background task started
+from the FastAPI lifespan in main.py: it claims due messages in batches,
+sends them over one reused SMTP connection from a worker thread, and
+reschedules failures with exponential backoff. Claims are leases, so a
+message claimed by a worker that crashed is picked up again once its lease
+runs out, and pending messages survive restarts.
+
+Message bodies carry reset links, so a message keeps its body only until it
+is sent or given up on. Sent and failed messages then keep their envelope
+and last error for OUTBOX_RETENTION_SECONDS (the expires_at TTL index
+removes them).
+
+For local testing point SMTP_HOST/SMTP_PORT at a stand-in server, e.g.
+    python -m aiosmtpd -n -l localhost:8025
+with SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=false.
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from models.database import database
+from utils.settings import settings
+
+email_outbox_collection = database.get_collection("email_outbox")
+
+SMTP_HOST = settings.smtp_host
+SMTP_PORT = settings.smtp_port
+SMTP_STARTTLS = settings.smtp_starttls
+SMTP_USER = settings.smtp_user or settings.gmail_user
+SMTP_PASSWORD = settings.smtp_password or settings.gmail_app_password
+# Close the pooled connection after this long without traffic (Gmail drops idle ones)
+SMTP_IDLE_TIMEOUT_SECONDS = settings.smtp_idle_timeout_seconds
+
+OUTBOX_BATCH_SIZE = settings.outbox_batch_size
+OUTBOX_POLL_SECONDS = settings.outbox_poll_seconds
+OUTBOX_MAX_ATTEMPTS = settings.outbox_max_attempts
+OUTBOX_LEASE_SECONDS = 120
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+OUTBOX_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+async def enqueue_email(to: str, subject: str, html: str, sender: str = None):
+    """Queue an email for the background sender; returns the outbox id"""
+    now = datetime.utcnow()
+    result = await email_outbox_collection.insert_one({
+        "to": to,
+        "from": sender or SMTP_USER,
+        "subject": subject,
+        "html": html,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    })
+    if outbox_sender is not None:
+        outbox_sender.wake()
+    return result.inserted_id
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+class OutboxSender:
+    def __init__(self):
+        self._smtp = None
+        self._last_used = 0.0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def wake(self):
+        self._wakeup.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(self._close)
+
+    # --- SMTP connection, only touched from worker threads ---
+
+    def _connect(self):
+        import smtplib
+        smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=30)
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USER and SMTP_PASSWORD:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        return smtp
+
+    def _close(self):
+        import smtplib
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            except OSError:
+                pass
+            self._smtp = None
+
+    def _connection(self, now: float):
+        if self._smtp is not None and now - self._last_used > SMTP_IDLE_TIMEOUT_SECONDS:
+            self._close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        self._last_used = now
+        return self._smtp
+
+    def _send_batch(self, messages: list, now: float) -> list:
+        """Send messages over the pooled connection; returns an error (or None) per message"""
+        import smtplib
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        errors = []
+        for message in messages:
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = message["subject"]
+            msg['From'] = message["from"]
+            msg['To'] = message["to"]
+            msg.attach(MIMEText(message["html"], 'html'))
+            try:
+                self._connection(now).send_message(msg)
+                errors.append(None)
+            except (smtplib.SMTPException, OSError) as e:
+                # Drop the connection so the next message starts a fresh one
+                self._close()
+                errors.append(str(e))
+        return errors
+
+    # --- queue handling ---
+
+    async def _claim_batch(self) -> list:
+        now = datetime.utcnow()
+        claimed = []
+        for _ in range(OUTBOX_BATCH_SIZE):
+            message = await email_outbox_collection.find_one_and_update(
+                {"$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "sending", "locked_until": {"$lte": now}}
+                ]},
+                {
+                    "$set": {"status": "sending", "locked_until": now + timedelta(seconds=OUTBOX_LEASE_SECONDS)},
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if message is None:
+                break
+            claimed.append(message)
+        return claimed
+
+    async def _record_results(self, messages: list, errors: list):
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=OUTBOX_RETENTION_SECONDS)
+        for message, error in zip(messages, errors):
+            if error is None:
+                update = {
+                    "$set": {"status": "sent", "sent_at": now, "expires_at": expires_at},
+                    "$unset": {"locked_until": "", "html": ""}
+                }
+                print(f"✅ Sent email to {message['to']}")
+            elif message["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                update = {
+                    "$set": {"status": "failed", "last_error": error, "expires_at": expires_at},
+                    "$unset": {"locked_until": "", "html": ""}
+                }
+                print(f"❌ Giving up on email to {message['to']}: {error}")
+            else:
+                update = {
+                    "$set": {
+                        "status": "pending",
+                        "last_error": error,
+                        "next_attempt_at": now + _backoff(message["attempts"])
+                    },
+                    "$unset": {"locked_until": ""}
+                }
+                print(f"⚠️ Email to {message['to']} failed, will retry: {error}")
+            await email_outbox_collection.update_one({"_id": message["_id"]}, update)
+
+    async def process_once(self) -> int:
+        """Send one batch of due messages; returns how many were attempted"""
+        messages = await self._claim_batch()
+        if messages:
+            loop = asyncio.get_running_loop()
+            errors = await asyncio.to_thread(self._send_batch, messages, loop.time())
+            await self._record_results(messages, errors)
+        return len(messages)
+
+    async def _run(self):
+        try:
+            await expire_finished_messages()
+        except Exception as e:
+            print(f"⚠️ Email outbox error: {e}")
+        while True:
+            self._wakeup.clear()
+            try:
+                if await self.process_once() == OUTBOX_BATCH_SIZE:
+                    continue  # more may be due right away
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Email outbox error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def expire_finished_messages() -> int:
+    """Scrub and schedule removal of sent or failed messages stored without an expiry"""
+    result = await email_outbox_collection.update_many(
+        {"status": {"$in": ["sent", "failed"]}, "expires_at": {"$exists": False}},
+        {
+            "$set": {"expires_at": datetime.utcnow() + timedelta(seconds=OUTBOX_RETENTION_SECONDS)},
+            "$unset": {"html": ""}
+        }
+    )
+    return result.modified_count
+
+
+outbox_sender = None
+
+def start_outbox_sender():
+    global outbox_sender
+    outbox_sender = OutboxSender()
+    outbox_sender.start()
+    return outbox_sender
+
+async def stop_outbox_sender():
+    global outbox_sender
+    if outbox_sender is not None:
+        await outbox_sender.stop()
+        outbox_sender = None
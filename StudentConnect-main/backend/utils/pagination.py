@@ -0,0 +1,38 @@
+import base64
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Feeds are ordered newest first; _id breaks ties between equal timestamps
+FEED_SORT = [("created_at", -1), ("_id", -1)]
+# Comment threads read oldest first
+THREAD_SORT = [("created_at", 1), ("_id", 1)]
+
+def encode_cursor(doc: dict) -> str:
+    """Build an opaque cursor pointing just after `doc` in its listing"""
+    raw = f"{doc['created_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Return (created_at, _id) from a cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, _id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def after_cursor(cursor: str, descending: bool = True) -> dict:
+    """Range predicate selecting documents that come after the cursor in
+    FEED_SORT (or in THREAD_SORT when descending is False)"""
+    created_at, _id = decode_cursor(cursor)
+    bound, strict = ("$lte", "$lt") if descending else ("$gte", "$gt")
+    # The top-level bound gives the planner a tight index range on created_at;
+    # the $or only filters the handful of entries sharing the cursor timestamp
+    return {
+        "created_at": {bound: created_at},
+        "$or": [
+            {"created_at": {strict: created_at}},
+            {"_id": {strict: _id}}
+        ]
+    }
@@ -0,0 +1,70 @@
+"""
+Coalesced, briefly cached reads for post detail and comment lists.
+
+When a post is popular, many clients ask for GET /api/posts/{post_id} and
+GET /api/comments/{post_id} at the same moment. read_post() and
+read_comments() route those reads through a SingleFlight, so concurrent
+requests for one post share a single MongoDB query. The result is then
+kept for POST_READ_CACHE_TTL_SECONDS (sub-second; 0 turns the cache off
+and leaves only the coalescing).
+
+create_new_comment calls invalidate_post(). That drops the cached entries
+and moves the post to a new generation. A query that was already running
+before the comment cannot be joined by later readers, and its result is not
+cached. Other workers, and profile picture changes copied onto posts, may
+show a stale entry for up to the TTL.
+
+Both functions return fresh copies of the documents, so callers may modify
+them (author hydration does).
+"""
+import itertools
+from collections import OrderedDict
+from models.database import get_comments_by_post_id, get_post_by_id
+from utils.cache import SingleFlight, TTLCache
+from utils.settings import settings
+
+POST_READ_CACHE_SIZE = settings.post_read_cache_size
+POST_READ_CACHE_TTL_SECONDS = settings.post_read_cache_ttl_seconds
+GENERATIONS_KEPT = 10_000
+
+post_cache = TTLCache("post_detail", maxsize=POST_READ_CACHE_SIZE, ttl=POST_READ_CACHE_TTL_SECONDS)
+comments_cache = TTLCache("post_comments", maxsize=POST_READ_CACHE_SIZE, ttl=POST_READ_CACHE_TTL_SECONDS)
+post_flight = SingleFlight("post_detail")
+comments_flight = SingleFlight("post_comments")
+
+# post id -> generation, for recently invalidated posts only. Older posts
+# fall back to generation 0, long after any query they started has finished
+_generations = OrderedDict()
+_next_generation = itertools.count(1)
+
+
+async def _coalesced(cache: TTLCache, flight: SingleFlight, post_id: str, load):
+    cached = cache.get(post_id)
+    if cached is not None:
+        return cached
+    generation = _generations.get(post_id, 0)
+    result = await flight.do((post_id, generation), load)
+    if result is not None and _generations.get(post_id, 0) == generation:
+        cache.set(post_id, result)
+    return result
+
+
+async def read_post(post_id: str):
+    """The full post document, or None if it does not exist"""
+    post = await _coalesced(post_cache, post_flight, post_id, lambda: get_post_by_id(post_id))
+    return dict(post) if post is not None else None
+
+
+async def read_comments(post_id: str) -> list:
+    """Every comment on a post in creation order"""
+    comments = await _coalesced(comments_cache, comments_flight, post_id, lambda: get_comments_by_post_id(post_id))
+    return [dict(comment) for comment in comments]
+
+
+def invalidate_post(post_id: str):
+    _generations[post_id] = next(_next_generation)
+    _generations.move_to_end(post_id)
+    while len(_generations) > GENERATIONS_KEPT:
+        _generations.popitem(last=False)
+    post_cache.invalidate(post_id)
+    comments_cache.invalidate(post_id)
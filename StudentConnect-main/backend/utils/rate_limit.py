@@ -0,0 +1,169 @@
+"""
+Token-bucket rate limiting for the expensive auth endpoints.
+
+Login runs a bcrypt verify and forgot-password writes a reset token and
+queues an email, so both are limited per client IP and per account before
+any of that work happens. A rejected request costs one bucket update and
+gets a 429 with Retry-After.
+
+Each RateLimit is a bucket of `capacity` tokens refilled evenly over
+`period_seconds`. Buckets live in process memory by default. Set
+RATE_LIMIT_STORE=mongo to share them between workers and instances through
+the rate_limits collection; that store needs MongoDB 4.2+.
+
+Behind a reverse proxy (Render, nginx) set TRUSTED_PROXY_HOPS to the number
+of proxies that append to X-Forwarded-For. Otherwise every client shares
+the proxy's address. render.yaml and the Procfile set it to 1.
+"""
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from models.database import database
+from utils.settings import settings
+
+RATE_LIMIT_ENABLED = settings.rate_limit_enabled
+RATE_LIMIT_STORE = settings.rate_limit_store
+RATE_LIMIT_MAX_KEYS = settings.rate_limit_max_keys
+TRUSTED_PROXY_HOPS = settings.trusted_proxy_hops
+
+rate_limits_collection = database.get_collection("rate_limits")
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    name: str
+    capacity: int
+    period_seconds: float
+
+    @property
+    def refill_per_second(self) -> float:
+        return self.capacity / self.period_seconds
+
+
+LOGIN_PER_IP = RateLimit("login:ip", settings.login_rate_per_ip, 60)
+# Every attempt takes a token up front and a successful login gives it back,
+# so only failures stay charged and a locked-out attacker does not lock the
+# owner out for long. Taking first bounds concurrent guesses too
+LOGIN_FAILURES_PER_ACCOUNT = RateLimit("login:account", settings.login_failures_per_account, 300)
+FORGOT_PASSWORD_PER_IP = RateLimit("forgot:ip", settings.forgot_password_rate_per_ip, 3600)
+FORGOT_PASSWORD_PER_ACCOUNT = RateLimit("forgot:account", settings.forgot_password_rate_per_account, 3600)
+
+
+class MemoryRateLimitStore:
+    """Buckets in a bounded LRU dict; per process"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, limit: RateLimit, key: str, cost: int = 1) -> float:
+        now = time.monotonic()
+        bucket_key = (limit.name, key)
+        tokens, updated = self._buckets.pop(bucket_key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.refill_per_second)
+        needed = max(cost, 1)
+        wait = 0.0
+        if tokens >= needed:
+            tokens -= cost
+        else:
+            wait = (needed - tokens) / limit.refill_per_second
+        self._buckets[bucket_key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def refund(self, limit: RateLimit, key: str, amount: int = 1):
+        now = time.monotonic()
+        bucket_key = (limit.name, key)
+        tokens, updated = self._buckets.pop(bucket_key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - updated) * limit.refill_per_second + amount)
+        self._buckets[bucket_key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+
+class MongoRateLimitStore:
+    """Buckets shared through one atomic pipeline update per request"""
+
+    @staticmethod
+    def _bucket_id(limit: RateLimit, key: str) -> str:
+        return f"{limit.name}:{hashlib.sha256(key.encode()).hexdigest()[:32]}"
+
+    @staticmethod
+    def _refilled(limit: RateLimit, extra: int = 0) -> dict:
+        elapsed = {"$divide": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, 1000]}
+        return {"$min": [
+            limit.capacity,
+            {"$add": [
+                {"$ifNull": ["$tokens", limit.capacity]}, {"$multiply": [elapsed, limit.refill_per_second]}, extra
+            ]}
+        ]}
+
+    async def take(self, limit: RateLimit, key: str, cost: int = 1) -> float:
+        bucket_id = self._bucket_id(limit, key)
+        needed = max(cost, 1)
+        refilled = self._refilled(limit)
+        bucket = await rate_limits_collection.find_one_and_update(
+            {"_id": bucket_id},
+            [
+                {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+                {"$set": {"allowed": {"$gte": ["$tokens", needed]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                    # A bucket left alone this long is full again and can be dropped
+                    "expires_at": {"$add": ["$$NOW", int(limit.period_seconds * 1000)]}
+                }},
+            ],
+            projection={"tokens": 1, "allowed": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (needed - bucket["tokens"]) / limit.refill_per_second
+
+    async def refund(self, limit: RateLimit, key: str, amount: int = 1):
+        await rate_limits_collection.update_one(
+            {"_id": self._bucket_id(limit, key)},
+            [{"$set": {"tokens": self._refilled(limit, amount), "updated_at": "$$NOW"}}]
+        )
+
+
+_store = None
+
+def get_rate_limit_store():
+    global _store
+    if _store is None:
+        _store = MongoRateLimitStore() if RATE_LIMIT_STORE == "mongo" else MemoryRateLimitStore()
+    return _store
+
+
+def client_ip(request: Request) -> str:
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limit(limit: RateLimit, key: str, cost: int = 1):
+    """Take `cost` tokens (cost=0 only checks); raise 429 if the bucket is empty"""
+    if not RATE_LIMIT_ENABLED:
+        return
+    wait = await get_rate_limit_store().take(limit, key, cost)
+    if wait > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please try again later",
+            headers={"Retry-After": str(math.ceil(wait))}
+        )
+
+
+async def refund_rate_limit(limit: RateLimit, key: str, amount: int = 1):
+    """Give back tokens taken by enforce_rate_limit (e.g. for a successful login)"""
+    if RATE_LIMIT_ENABLED:
+        await get_rate_limit_store().refund(limit, key, amount)
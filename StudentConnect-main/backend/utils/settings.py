@@ -0,0 +1,112 @@
+"""
+Application settings, read once from the environment and backend/.env.
+
+`settings` is built the first time this module is imported. Every other
+module reads its configuration from it instead of calling load_dotenv or
+os.getenv itself. Field names are the lower-case environment variable
+names, so MONGO_MAX_POOL_SIZE=100 sets settings.mongo_max_pool_size.
+Real environment variables take precedence over .env, as they did with
+load_dotenv.
+
+Scripts and benchmarks that override a variable must set it in os.environ
+before importing anything from the app.
+"""
+from pathlib import Path
+from typing import Optional
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=BACKEND_DIR / ".env", extra="ignore")
+
+    environment: str = "development"
+    frontend_url: str = "http://localhost:3000"
+    # Required in the X-Admin-Token header of admin endpoints; empty disables them
+    admin_api_token: str = ""
+    ensure_indexes_on_startup: bool = True
+    # GET /ready fails if MongoDB does not answer a ping within this long
+    ready_ping_timeout_seconds: float = 2.0
+    outbox_sender_enabled: bool = True
+
+    # MongoDB
+    mongodb_url: str = "mongodb://localhost:27017"
+    database_name: str = "haripriya_db"
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int = 300_000
+    mongo_wait_queue_timeout_ms: int = 5000
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_connect_timeout_ms: int = 10_000
+    mongo_socket_timeout_ms: int = 20_000
+    feed_read_preference: str = "primary"
+    slow_query_log_enabled: bool = True
+    slow_query_ms: float = 100
+    slow_query_explain: bool = False
+    slow_query_max_pending: int = 100
+
+    # Auth
+    secret_key: str = "your-secret-key-here"
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue_timeout: float = 5.0
+    user_cache_size: int = 1000
+    user_cache_ttl_seconds: float = 60.0
+    # How often cached users and authors are checked against the shared version counters
+    cache_version_check_seconds: float = 1.0
+    author_hydration: bool = False
+    author_cache_size: int = 5000
+    author_cache_ttl_seconds: float = 30.0
+    post_read_cache_size: int = 1000
+    post_read_cache_ttl_seconds: float = 0.5
+    hot_feed_enabled: bool = True
+    hot_feed_size: int = 100
+    hot_feed_check_seconds: float = 1.0
+    hot_feed_resync_seconds: float = 60
+
+    # Rate limits
+    rate_limit_enabled: bool = True
+    rate_limit_store: str = "memory"
+    rate_limit_max_keys: int = 100_000
+    trusted_proxy_hops: int = 0
+    login_rate_per_ip: int = 20
+    login_failures_per_account: int = 5
+    forgot_password_rate_per_ip: int = 5
+    forgot_password_rate_per_account: int = 3
+
+    # Concurrency limits (utils/load_shedding.py)
+    load_shedding_enabled: bool = True
+    concurrency_limit_auth: int = 8
+    concurrency_limit_uploads: int = 4
+    concurrency_limit_reads: int = 64
+    concurrency_queue_timeout_seconds: float = 2.0
+    concurrency_target_queue_ms: float = 100
+
+    # Uploads
+    storage_backend: str = "cloudinary"
+    media_root: Path = BACKEND_DIR / "media"
+    media_url: str = "http://localhost:8000/media"
+    max_document_bytes: int = 10 * 1024 * 1024
+    max_profile_picture_bytes: int = 5 * 1024 * 1024
+    upload_concurrency: int = 4
+    upload_chunk_bytes: int = 6 * 1024 * 1024
+    cloudinary_cloud_name: Optional[str] = None
+    cloudinary_api_key: Optional[str] = None
+    cloudinary_api_secret: Optional[str] = None
+
+    # Email
+    gmail_user: str = ""
+    gmail_app_password: str = ""
+    smtp_host: str = "smtp.gmail.com"
+    smtp_port: int = 587
+    smtp_starttls: bool = True
+    smtp_user: str = ""
+    smtp_password: str = ""
+    smtp_idle_timeout_seconds: float = 60
+    outbox_batch_size: int = 20
+    outbox_poll_seconds: float = 5
+    outbox_max_attempts: int = 6
+
+
+settings = Settings()
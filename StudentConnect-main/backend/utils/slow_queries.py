@@ -0,0 +1,329 @@
+"""
+Slow query log.
+
+`SlowQueryLog` is a pymongo CommandListener on the client in
+models/database.py. Any command that takes longer than SLOW_QUERY_MS is
+printed with its collection, duration, documents returned and query shape.
+The shape is the filter, sort and pipeline with every value replaced by "?".
+For example, {"post_id": "652f..."} becomes {"post_id": "?"}, so all
+comment reads share one shape and no user data reaches the log.
+
+While the app runs (start_slow_query_log() in the lifespan), each slow
+command is also counted per shape in the slow_queries collection. With
+SLOW_QUERY_EXPLAIN=true, the first occurrence of a read shape (find,
+aggregate, count, distinct) is re-run as explain("executionStats"), and the
+plan summary is stored with the shape. The explain is off by default
+because it runs the query a second time.
+
+List the worst shapes with GET /metrics/slow-queries (main.py), or:
+    python -m utils.slow_queries [--limit 20] [--sort total_ms|max_ms|count]
+    python -m utils.slow_queries --reset
+"""
+import argparse
+import asyncio
+import hashlib
+import sys
+import threading
+from datetime import datetime
+from bson import json_util
+from pymongo import monitoring
+from utils.settings import settings
+
+SLOW_QUERY_LOG_ENABLED = settings.slow_query_log_enabled
+SLOW_QUERY_MS = settings.slow_query_ms
+SLOW_QUERY_EXPLAIN = settings.slow_query_explain
+# Slow queries waiting to be recorded; more than this are only printed
+SLOW_QUERY_MAX_PENDING = settings.slow_query_max_pending
+
+SLOW_QUERIES_COLLECTION = "slow_queries"
+SORT_FIELDS = ("total_ms", "max_ms", "count")
+
+EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+# The listener's own writes and the explains it runs must not be logged again
+_IGNORED_COMMANDS = {"explain", "getMore", "killCursors", "endSessions", "hello", "isMaster", "ismaster", "ping"}
+# Session and routing fields that explain rejects or that pin the original request
+_COMMAND_ONLY_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern"}
+# Command fields query_shape() reads, besides the command name
+_SHAPE_FIELDS = ("filter", "sort", "projection", "pipeline", "query", "key")
+
+
+def redact(value):
+    """Replace every value in a filter with "?" but keep field names and operators"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in lists of different lengths are the same shape
+        if all(not isinstance(item, (dict, list, tuple)) for item in value):
+            return ["?"] if value else []
+        return [redact(item) for item in value]
+    return "?"
+
+
+def _pipeline_shape(pipeline: list) -> list:
+    shape = []
+    for stage in pipeline:
+        name, spec = next(iter(stage.items()))
+        # Sort directions and projected field names are not data
+        shape.append({name: spec if name in ("$sort", "$project") else redact(spec)})
+    return shape
+
+
+def query_shape(command_name: str, command: dict) -> dict:
+    """The redacted, value-free part of a command that identifies its query"""
+    if command_name == "find":
+        shape = {"filter": redact(command.get("filter", {}))}
+        if "sort" in command:
+            shape["sort"] = dict(command["sort"])
+        if "projection" in command:
+            shape["projection"] = sorted(command["projection"])
+        return shape
+    if command_name == "aggregate":
+        return {"pipeline": _pipeline_shape(command.get("pipeline", []))}
+    if command_name == "count":
+        return {"query": redact(command.get("query", {}))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": redact(command.get("query", {}))}
+    if command_name == "findAndModify":
+        shape = {"query": redact(command.get("query", {}))}
+        if "sort" in command:
+            shape["sort"] = dict(command["sort"])
+        return shape
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return {"q": redact(statements[0].get("q", {}))}
+    return {}
+
+
+def retained_command(command_name: str, command: dict) -> dict:
+    """The part of a command kept until it finishes: what query_shape() reads,
+    or the whole read command when it may be explained. Never insert documents
+    or update bodies."""
+    if SLOW_QUERY_EXPLAIN and command_name in EXPLAINABLE:
+        return {key: value for key, value in command.items() if key not in _COMMAND_ONLY_FIELDS and not key.startswith("$")}
+    kept = {command_name: command.get(command_name)}
+    kept.update((field, command[field]) for field in _SHAPE_FIELDS if field in command)
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        kept["updates" if command_name == "update" else "deletes"] = [{"q": statements[0].get("q", {})}]
+    return kept
+
+
+def docs_returned(command_name: str, reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if command_name == "findAndModify":
+        return 1 if reply.get("value") is not None else 0
+    if command_name == "distinct":
+        return len(reply.get("values", []))
+    return int(reply.get("n", 0))
+
+
+def _explain_summary(explain: dict) -> dict:
+    """nReturned, keys and documents examined, and the winning plan's stages"""
+    from models.indexes import plan_stages
+
+    def find(document, key):
+        if isinstance(document, dict):
+            if key in document:
+                return document[key]
+            children = document.values()
+        elif isinstance(document, list):
+            children = document
+        else:
+            return None
+        for child in children:
+            found = find(child, key)
+            if found is not None:
+                return found
+        return None
+
+    stats = find(explain, "executionStats") or {}
+    winning_plan = find(explain, "winningPlan") or {}
+    return {
+        "stages": " <- ".join(plan_stages(winning_plan)),
+        "n_returned": stats.get("nReturned"),
+        "execution_ms": stats.get("executionTimeMillis"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, max_pending: int = 10_000):
+        self.threshold_ms = threshold_ms
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        # Started events carry the command; finished events only its ids.
+        # Commands started while this is full are not checked
+        self._commands = {}
+        self._explained = set()
+        self._loop = None
+        self._tasks = set()
+
+    def _tracked(self, event) -> bool:
+        return (
+            event.command_name not in _IGNORED_COMMANDS
+            and event.command.get(event.command_name) != SLOW_QUERIES_COLLECTION
+        )
+
+    def started(self, event):
+        if self._tracked(event):
+            command = retained_command(event.command_name, event.command)
+            with self._lock:
+                if len(self._commands) < self.max_pending:
+                    self._commands[(event.connection_id, event.request_id)] = (event.database_name, command)
+
+    def succeeded(self, event):
+        with self._lock:
+            started = self._commands.pop((event.connection_id, event.request_id), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+        database_name, command = started
+        collection = command.get(event.command_name)
+        shape = query_shape(event.command_name, command)
+        shape_json = json_util.dumps(shape, sort_keys=True)
+        returned = docs_returned(event.command_name, event.reply)
+        print(f"⚠️ Slow query: {event.command_name} {collection} {duration_ms:.0f}ms, {returned} docs, shape {shape_json}")
+
+        if self._loop is not None:
+            shape_id = hashlib.blake2b(f"{collection}:{event.command_name}:{shape_json}".encode(), digest_size=8).hexdigest()
+            record = {
+                "shape_id": shape_id,
+                "database_name": database_name,
+                "collection": collection,
+                "command_name": event.command_name,
+                "shape": shape_json,
+                "duration_ms": duration_ms,
+                "docs_returned": returned,
+            }
+            explain = self._claim_explain(shape_id, event.command_name, command)
+            self._loop.call_soon_threadsafe(self._spawn, record, explain)
+
+    def failed(self, event):
+        with self._lock:
+            self._commands.pop((event.connection_id, event.request_id), None)
+
+    def _claim_explain(self, shape_id: str, command_name: str, command: dict):
+        """The command to explain if this is the first slow run of its shape"""
+        if not SLOW_QUERY_EXPLAIN or command_name not in EXPLAINABLE:
+            return None
+        if command_name == "aggregate" and any("$out" in stage or "$merge" in stage for stage in command.get("pipeline", [])):
+            return None
+        with self._lock:
+            if shape_id in self._explained:
+                return None
+            self._explained.add(shape_id)
+        return command
+
+    # --- recording, on the event loop ---
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        self._loop = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _spawn(self, record: dict, explain):
+        if len(self._tasks) >= SLOW_QUERY_MAX_PENDING:
+            return
+        task = asyncio.create_task(self._record(record, explain))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _record(self, record: dict, explain):
+        from models.database import database, get_client
+        collection = database.get_collection(SLOW_QUERIES_COLLECTION)
+        now = datetime.utcnow()
+        try:
+            await collection.update_one(
+                {"_id": record["shape_id"]},
+                {
+                    "$setOnInsert": {
+                        "collection": record["collection"],
+                        "command": record["command_name"],
+                        "shape": record["shape"],
+                        "first_seen": now,
+                    },
+                    "$inc": {"count": 1, "total_ms": record["duration_ms"]},
+                    "$max": {"max_ms": record["duration_ms"], "max_docs_returned": record["docs_returned"]},
+                    "$set": {"last_seen": now},
+                },
+                upsert=True
+            )
+            if explain is not None:
+                result = await get_client()[record["database_name"]].command(
+                    {"explain": explain, "verbosity": "executionStats"}
+                )
+                await collection.update_one(
+                    {"_id": record["shape_id"]},
+                    {"$set": {"explain": _explain_summary(result), "explained_at": datetime.utcnow()}}
+                )
+        except Exception as e:
+            print(f"⚠️ Warning: could not record slow query {record['shape_id']}: {e}")
+
+
+slow_query_log = SlowQueryLog()
+
+
+def start_slow_query_log():
+    if SLOW_QUERY_LOG_ENABLED:
+        slow_query_log.start()
+
+
+async def stop_slow_query_log():
+    await slow_query_log.stop()
+
+
+async def top_slow_queries(limit: int = 20, sort: str = "total_ms") -> list:
+    """The recorded shapes with the highest total time (or max_ms, or count)"""
+    from models.database import database
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}")
+    cursor = database.get_collection(SLOW_QUERIES_COLLECTION).find().sort(sort, -1).limit(limit)
+    shapes = []
+    async for doc in cursor:
+        doc["shape_id"] = doc.pop("_id")
+        doc["avg_ms"] = round(doc["total_ms"] / doc["count"], 1) if doc.get("count") else 0.0
+        shapes.append(doc)
+    return shapes
+
+
+async def _main(argv) -> int:
+    parser = argparse.ArgumentParser(description="List the slowest MongoDB query shapes")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--sort", choices=SORT_FIELDS, default="total_ms")
+    parser.add_argument("--reset", action="store_true", help="forget every recorded shape")
+    args = parser.parse_args(argv)
+
+    if args.reset:
+        from models.database import database
+        result = await database.get_collection(SLOW_QUERIES_COLLECTION).delete_many({})
+        print(f"✅ Removed {result.deleted_count} slow query shapes")
+        return 0
+
+    shapes = await top_slow_queries(args.limit, args.sort)
+    if not shapes:
+        print("✅ No slow queries recorded")
+    for doc in shapes:
+        print(
+            f"{doc['shape_id']}  {doc['collection']}.{doc['command']}  "
+            f"count {doc['count']}  avg {doc['avg_ms']}ms  max {doc['max_ms']:.0f}ms  "
+            f"docs {doc.get('max_docs_returned', 0)}"
+        )
+        print(f"    shape: {doc['shape']}")
+        if doc.get("explain"):
+            explain = doc["explain"]
+            print(
+                f"    plan:  {explain['stages']} (keys {explain['keys_examined']}, "
+                f"docs {explain['docs_examined']}, returned {explain['n_returned']})"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
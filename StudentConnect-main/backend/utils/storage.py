@@ -0,0 +1,226 @@
+"""
+Media storage for post documents and profile pictures.
+
+STORAGE_BACKEND selects where uploads go:
+    cloudinary  (default) Cloudinary, via utils/cloudinary.py
+    local       files under MEDIA_ROOT served from /media, for tests and single-node installs
+
+Uploads are size-checked twice: UploadSizeLimitMiddleware rejects a request
+body as soon as it grows past the route's cap, and save_upload() checks the
+exact file size before streaming it to the backend from a worker thread.
+At most UPLOAD_CONCURRENCY uploads run at the same time.
+
+Local files are served from the API's own origin, so nothing the client
+sends decides how they are rendered: the stored extension comes from
+SAFE_EXTENSIONS by content type (none for other types), and MediaFiles
+sends nosniff and makes everything but raster images and PDFs a download.
+"""
+import asyncio
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Optional
+from fastapi import UploadFile
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from utils.settings import settings
+
+STORAGE_BACKEND = settings.storage_backend
+MEDIA_ROOT = settings.media_root
+MEDIA_URL = settings.media_url
+
+MAX_DOCUMENT_BYTES = settings.max_document_bytes
+MAX_PROFILE_PICTURE_BYTES = settings.max_profile_picture_bytes
+UPLOAD_CONCURRENCY = settings.upload_concurrency
+
+# Room for the other multipart form fields (title, content, ...) on top of the file
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+# Content type -> extension for locally stored uploads. Types that a browser
+# renders as active content (HTML, SVG, XML) are deliberately missing
+SAFE_EXTENSIONS = {
+    "application/pdf": ".pdf",
+    "application/msword": ".doc",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": ".docx",
+    "application/vnd.ms-powerpoint": ".ppt",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation": ".pptx",
+    "application/vnd.ms-excel": ".xls",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet": ".xlsx",
+    "application/zip": ".zip",
+    "text/plain": ".txt",
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+# Extensions MediaFiles lets the browser show inline; the rest are downloads
+INLINE_EXTENSIONS = {".pdf", ".png", ".jpg", ".gif", ".webp"}
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File size must be less than {max_bytes // (1024 * 1024)}MB")
+        self.max_bytes = max_bytes
+
+
+class CloudinaryStorage:
+    async def save(self, file, folder: str, filename: Optional[str] = None, content_type: Optional[str] = None) -> dict:
+        from utils.cloudinary import upload_file_to_cloudinary
+        return await upload_file_to_cloudinary(file, folder=folder, filename=filename)
+
+    async def delete_url(self, url: str, folder: str):
+        from utils.cloudinary import delete_file_from_cloudinary
+        if "cloudinary.com" not in url:
+            return
+        # Public id is the last path segment without its extension
+        public_id = url.split("/")[-1].split(".")[0]
+        await delete_file_from_cloudinary(f"{folder}/{public_id}")
+
+
+class LocalStorage:
+    def __init__(self, root: Path = MEDIA_ROOT, base_url: str = MEDIA_URL):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _write(self, file, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file, out, COPY_CHUNK_BYTES)
+
+    async def save(self, file, folder: str, filename: Optional[str] = None, content_type: Optional[str] = None) -> dict:
+        # Never the client's own suffix: /media would serve x.html as HTML
+        suffix = SAFE_EXTENSIONS.get((content_type or "").split(";")[0].strip().lower(), "")
+        public_id = f"{folder}/{uuid.uuid4().hex}"
+        await run_in_threadpool(self._write, file, self.root / f"{public_id}{suffix}")
+        return {
+            "url": f"{self.base_url}/{public_id}{suffix}",
+            "public_id": public_id
+        }
+
+    async def delete_url(self, url: str, folder: str):
+        if not url.startswith(self.base_url + "/"):
+            return
+        path = (self.root / url[len(self.base_url) + 1:]).resolve()
+        if self.root.resolve() in path.parents:
+            await run_in_threadpool(path.unlink, True)
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles for MEDIA_ROOT that never lets an upload run as content of this origin"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        if Path(full_path).suffix.lower() not in INLINE_EXTENSIONS:
+            response.headers["Content-Disposition"] = "attachment"
+        return response
+
+
+_storage = None
+_upload_slots = None
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = LocalStorage() if STORAGE_BACKEND == "local" else CloudinaryStorage()
+    return _storage
+
+
+def _file_size(file) -> int:
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+async def check_upload_size(upload: UploadFile, max_bytes: int):
+    """Raise UploadTooLarge if the upload is over `max_bytes`"""
+    # Starlette has already spooled the body to a temp file (the middleware
+    # capped its size); measure it without reading it into memory
+    if await run_in_threadpool(_file_size, upload.file) > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+
+async def save_upload(upload: UploadFile, folder: str, max_bytes: int) -> dict:
+    """Stream an uploaded file to the configured storage backend"""
+    global _upload_slots
+    await check_upload_size(upload, max_bytes)
+    await upload.seek(0)
+
+    if _upload_slots is None:
+        _upload_slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+    async with _upload_slots:
+        return await get_storage().save(
+            upload.file, folder=folder, filename=upload.filename, content_type=upload.content_type
+        )
+
+
+class UploadSizeLimitMiddleware:
+    """Reject upload requests with 413 as soon as their body passes the route cap"""
+
+    def __init__(self, app, limits: dict):
+        # limits: {(method, path): max body bytes}
+        self.app = app
+        self.limits = limits
+
+    async def _reject(self, send, limit: int):
+        body = f'{{"detail":"{UploadTooLarge(limit - FORM_OVERHEAD_BYTES)}"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limit = None
+        if scope["type"] == "http":
+            limit = self.limits.get((scope["method"], scope["path"]))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Stop reading; the app sees a disconnect and gives up parsing
+                    exceeded = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not exceeded:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded:
+            await self._reject(send, limit)
+
+
+def upload_limits(prefix: str = "/api") -> dict:
+    """Body size caps for the routes that accept file uploads"""
+    return {
+        ("POST", f"{prefix}/posts/"): MAX_DOCUMENT_BYTES + FORM_OVERHEAD_BYTES,
+        ("POST", f"{prefix}/auth/profile/picture"): MAX_PROFILE_PICTURE_BYTES + FORM_OVERHEAD_BYTES,
+    }
@@ -0,0 +1,119 @@
+"""
+Startup warmup and readiness.
+
+`GET /` only says the process is up. `GET /ready` (main.py) answers 200
+once the warmup has finished and MongoDB still answers a ping. Until then
+it answers 503, so Render (healthCheckPath in render.yaml) keeps routing
+traffic to the previous deploy until this one is warm.
+
+The warmup runs as a background task started from the lifespan, so the
+server accepts connections at once. It:
+1. opens MONGO_MIN_POOL_SIZE pool connections (at least one) with
+   concurrent pings, through test_database_connection(). Failures are
+   retried with backoff until the database answers.
+2. creates missing indexes (ENSURE_INDEXES_ON_STARTUP).
+3. runs every function registered with @warmup_hook, e.g. loading the
+   first feed page in routes/posts.py. A failing hook is reported in
+   /ready but does not block readiness.
+"""
+import asyncio
+import time
+from models.database import MONGO_MIN_POOL_SIZE, database, test_database_connection
+from models.indexes import ensure_indexes
+from utils.settings import settings
+
+ENSURE_INDEXES_ON_STARTUP = settings.ensure_indexes_on_startup
+READY_PING_TIMEOUT_SECONDS = settings.ready_ping_timeout_seconds
+RETRY_BASE_SECONDS = 1
+RETRY_MAX_SECONDS = 30
+
+_hooks = []
+
+
+def warmup_hook(func):
+    """Register an async function to run after the database answers and before /ready"""
+    _hooks.append(func)
+    return func
+
+
+async def _open_connections() -> bool:
+    # Concurrent pings each need their own connection, so the pool ends up
+    # with this many open sockets
+    extra_pings = [database.command("ping") for _ in range(max(MONGO_MIN_POOL_SIZE, 1) - 1)]
+    ok, *_ = await asyncio.gather(test_database_connection(), *extra_pings)
+    return ok
+
+
+class Warmup:
+    def __init__(self):
+        self.ready = False
+        self.steps = {}
+        self._task = None
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _step(self, name: str, func) -> bool:
+        started = time.perf_counter()
+        try:
+            result = await func()
+            ok = result is not False
+            error = None if ok else "failed"
+        except Exception as e:
+            ok, error = False, str(e)
+        self.steps[name] = {"ok": ok, "ms": round((time.perf_counter() - started) * 1000, 1)}
+        if error:
+            self.steps[name]["error"] = error
+            print(f"⚠️ Warning: warmup step {name} failed: {error}")
+        return ok
+
+    async def _run(self):
+        delay = RETRY_BASE_SECONDS
+        while not await self._step("database", _open_connections):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX_SECONDS)
+        if ENSURE_INDEXES_ON_STARTUP:
+            # Queries still work without indexes, just slower
+            await self._step("indexes", ensure_indexes)
+        for hook in _hooks:
+            await self._step(hook.__name__, hook)
+        self.ready = True
+        print(f"✅ Ready after {time.perf_counter() - self._started:.2f}s")
+
+    async def check(self) -> dict:
+        """Readiness report; `ready` also requires a live ping"""
+        report = {"ready": self.ready, "steps": self.steps}
+        if self.ready:
+            try:
+                await asyncio.wait_for(database.command("ping"), timeout=READY_PING_TIMEOUT_SECONDS)
+            except Exception as e:
+                report["ready"] = False
+                report["error"] = f"database ping failed: {e}" if str(e) else "database ping timed out"
+        return report
+
+
+warmup = None
+
+
+def start_warmup():
+    global warmup
+    warmup = Warmup()
+    warmup.start()
+    return warmup
+
+
+async def stop_warmup():
+    global warmup
+    if warmup is not None:
+        await warmup.stop()
+        warmup = None